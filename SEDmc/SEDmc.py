@@ -12,8 +12,8 @@ Notes:
 a. Package versions used in this version can be found in SEDmc_packages.txt.
 b. Data/Planet_Sample/Radius Valley Planet Sample.xlsx (Sample) file is use to create input files (e.g., batch, baseline) 
    and will be used to estimate all planet parameters from SEDmc output files.
-c. Each star can take several minutes to run depending on the processing speed of the host system. The input batch file
-   can seperated in smaller groups of stars (e.g., Batch_1_IN_RV_1-300.csv) and be ran concurrently using TMUX or equivalent. 
+c. Each star can take several minutes to run depending on the processing speed of the host system. SEDmc_Batch_1.py
+   fits the stars in the input batch file concurrently, one star per CPU core (see n_proc in that script). 
 
 To use this module to reproduce the Radius Valley analysis described in the repo, use the following prodedure:
 
@@ -36,165 +36,81 @@ To use this module to reproduce the Radius Valley analysis described in the repo
 # Import all the needed libraries
 
 # Standard Python packages
+import os
+# Use one BLAS/OpenMP thread per SEDmc process (batch runs fit one star per CPU core). Must be set before numpy import.
+for thread_var in ('OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'OMP_NUM_THREADS'):
+    os.environ.setdefault(thread_var, '1')
 import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')    # Figures are only saved to file, so use the non-interactive backend
 import matplotlib.pyplot as plt
-import os
 import sys
-import math
-from datetime import date, datetime
-from multiprocessing import Pool
-from contextlib import closing
+import time
+from datetime import date, timedelta
 from PIL import Image
 from io import BytesIO
 from http.client import HTTPConnection
+import glob
+import re
+import math
+from concurrent.futures import ThreadPoolExecutor
 
 # Special Python packages
 import pickle
+import functools
+import argparse
+from dataclasses import dataclass
+from typing import Optional, Tuple
 import emcee
 import corner
 from fpdf import FPDF
 from fpdf.enums import XPos, YPos
 from astroquery.simbad import Simbad
 from astroquery.gaia import Gaia
-from astropy import units as u
 from astropy.table import Table
 
 #Local Python files
 from config import *
 
 
-# # Function to prompt user for input parameters
-def prompt_input(err_str):
-    sname = input('Enter Object Name (e.g., WASP95): ')
-    if sname == "":
-        print(err_str)
-        sys.exit(0)                                   # If Object Name not entered, print error and exit
-    # sname = sname.strip('\n')
-    print(sname)
-    rad = input('Enter RA (e.g., 313.783235, not required): ')
-    position = (0,0)  ### Null Position
-    if rad == "":
-        sposition = False
-    else:                                             # Only prompt for DEC if RA entered
-        print(rad)
-        dec = input('Enter DEC (e.g., -34.135745, not required): ')
-
-        if dec == "":
-            sposition = False
-        else:
-            position = (float('{:.7f}'.format(rad)), float('{:.7f}'.format(dec)))     # Set position SED() input parameter
-            sposition = True
-            print(dec)
-    plx = input('Enter Parallax (default = GAIA value (if available), not required): ')
-    if plx != "":
-        plx = float(plx)                       # If GAIA doesn't return parallax, look up in SIMBAD and enter manually
-    Teff_bmk =  input('Enter estimated Teff (default = GAIA DR2 value): ')
-    if Teff_bmk == "":
-        use_Teff_bmk = False   # Set flag to use SEDFit Teff
-    else:
-        Teff_bmk = int(Teff_bmk)
-        use_Teff_bmk = True   # Set flag to use estimated Teff when known
-    ang_dia = input('Enter estimated Angular Diameter (default = GAIA DR2 value): ')
-    if ang_dia == "":
-        use_ang_dia = False                 # Set flag to use SEDFit ang_dia
-    else:
-        ang_dia = float(ang_dia)
-        use_ang_dia = True   # Set flag to use estimated ang_dia when known
-    starmodel = input('Enter Stellar Model (default = nextgen, not required): ')
-    if starmodel == "":                      # Enter any model supported by SED()
-        smodel = False
-    else:
-        smodel = True
-    # star_model = starmodel = starmodel.strip('\n')
-    print(starmodel, smodel)
-    # Enter EMCEE sampling parameters or accept defaults
-    nwalkers = input('Enter Number of Walkers (default = 50, not required): ')
-    if nwalkers == "":
-        nwalkers = 50
-    nwalkers = int(nwalkers)
-    niter = input('Enter Number of Iterations (default = 10,000, not required): ')
-    if niter == "":
-        niter = 10000
-    niter = int(niter)
-    burn_in = input('Enter Number of Burn In Iterations (default = 500, not required): ')
-    if burn_in == "":
-        burn_in = 500
-    burn_in = int(burn_in)
-    use_stored = input('Use Stored Photometry Data? (default = no, not required): ')
-    if use_stored == "":
-        use_stored = False
-    else:
-        use_stored = True
-    return sname, sposition, plx, Teff_bmk, use_Teff_bmk, ang_dia, use_ang_dia, smodel, nwalkers, niter, burn_in, \
-           use_stored, starmodel, position
-
-
-# # If "-p" not found this command line parameters expected
-#  in this order-> required: Object(e.g., WASP94); optional: RA DEC Model
+# # Star input parameters
+#  Command line arguments expected in this order-> required: Object(e.g., WASP94);
+#  optional: Parallax Teff AngDia Model UseStored RA DEC (same order as the batch input file columns)
 #  Can't use spaces in Object Name
-def parse_arg(len_arg, err_str):
-    position = (0,0)  ### Null Position
-    star_model = "ck04"
-    if len_arg > 1:
-        sname = str(sys.argv[1])         # Object name is first argument (required)
-        if len_arg > 2:
-            plx = float(sys.argv[2])     # Parallax is 2nd argument (optional)
-            if len_arg > 3:
-                Teff_bmk = int(sys.argv[3])     # Teff for Benchmark Star is 3nd argument (optional)
-                use_Teff_bmk = True
-                if len_arg > 4:
-                    ang_dia_bmk = float(sys.argv[4])     # Angular Diameter for Benchmark Star is 4th argument (optional)
-                    use_ang_dia_bmk = True
-                    if len_arg > 5:
-                        star_model = starmodel = sys.argv[5]           # Stellar model is 5th argument (optional)
-                        smodel = True
-                        if len_arg > 6:
-                            use_stored_flag = (sys.argv[6])    # Use Stored Data flag is 6th argument (optional)
-                            print(use_stored_flag)
-                            if use_stored_flag == "n":
-                                use_stored = False
-                            else:
-                                use_stored = True
-                            print(use_stored)
-                            if len_arg > 9:      # Too many parameters, give error and exit
-                                print(err_str)
-                                sys.exit(0)
-                            elif len_arg == 9:
-                                position = (float(sys.argv[7]), float(sys.argv[8]))  # Position (RA & DEC are 7th & 8th argument (optional)
-                                sposition = True
-                                return sname, plx, Teff_bmk, ang_dia_bmk, sposition, smodel, use_ang_dia_bmk, use_Teff_bmk, \
-                                       use_stored, star_model, position
-                            elif len_arg == 8:   # Position incomplete, give error and exit
-                                print(err_str)
-                                sys.exit(0)
-                            sposition = False      #   Only 6 args, no postiion
-                            return sname, plx, Teff_bmk, ang_dia_bmk, sposition, smodel, use_ang_dia_bmk, use_Teff_bmk, \
-                                   use_stored, star_model, position
-                        else:   #  Only 5 arg, no stored flag
-                            use_stored, sposition = False, False
-                            return sname, plx, Teff_bmk, ang_dia_bmk, sposition, smodel, use_ang_dia_bmk, use_Teff_bmk, \
-                                   use_stored, star_model, position
-                    else:     #  Only 4 args, no star model
-                        smodel, sposition, use_stored = False, False, False
-                        return sname, plx, Teff_bmk, ang_dia_bmk, sposition, smodel, use_ang_dia_bmk, use_Teff_bmk, \
-                               use_stored, star_model, position
-                else:     # Only 3 arg, no ang_dia
-                    ang_dia_bmk, smodel, sposition, use_ang_dia_bmk, use_stored = "", False, False, False, False
-                    return sname, plx, Teff_bmk, ang_dia_bmk, sposition, smodel, use_ang_dia_bmk, use_Teff_bmk, use_stored, star_model, position
-            else:    # Only 2 args, no Teff_bmk
-                Teff_bmk, ang_dia_bmk, smodel, sposition, use_Teff_bmk, use_ang_dia_bmk, use_stored = "", "", False, False, False, False, False
-                return sname, plx, Teff_bmk, ang_dia_bmk, sposition, smodel, use_ang_dia_bmk, use_Teff_bmk, use_stored, star_model, position
-        else:    # Only 1 arg, no plx
-            plx, Teff_bmk, ang_dia_bmk, smodel, sposition, use_Teff_bmk, use_ang_dia_bmk, use_stored = "", "", "", False, False, False, False, False
-            return sname, plx, Teff_bmk, ang_dia_bmk, sposition, smodel, use_ang_dia_bmk, use_Teff_bmk, use_stored, star_model, position
-    else:
-        print(err_str)
-        sys.exit(0)
-
-
-
-def query_sed(pos, radius=1):
+@dataclass
+class StarParams:
+    sname: str
+    plx: Optional[float] = None
+    Teff_bmk: Optional[int] = None
+    ang_dia: Optional[float] = None
+    starmodel: str = 'ck04'
+    use_stored: bool = False
+    position: Tuple[float, float] = (0, 0)   ### Null Position
+    nwalkers: int = nwalkers   # EMCEE sampling defaults from config.py
+    niter: int = niter
+    burn_in: int = burn_in
+
+    @classmethod
+    def from_argv(cls, argv=None):
+        """Parse command line arguments (sys.argv[1:] if argv is None)."""
+        parser = argparse.ArgumentParser(description='Fit Teff and Rstar of a star with SEDmc')
+        parser.add_argument('Object', help='Object name (e.g., WASP94)')
+        parser.add_argument('Parallax', nargs='?', type=float)
+        parser.add_argument('Teff', nargs='?', type=int, help='Teff for Benchmark Star')
+        parser.add_argument('AngDia', nargs='?', type=float, help='Angular Diameter for Benchmark Star')
+        parser.add_argument('Model', nargs='?', default='ck04', help='Stellar model (ck04 or nextgen)')
+        parser.add_argument('UseStored', nargs='?', default='n', help='Use Stored Data flag (n = no)')
+        parser.add_argument('RA', nargs='?', type=float)
+        parser.add_argument('DEC', nargs='?', type=float)
+        args = parser.parse_args(argv)
+        if (args.RA is None) != (args.DEC is None):   # Position incomplete, give error and exit
+            parser.error('RA and DEC must both be given')
+        position = (args.RA, args.DEC) if args.RA is not None else (0, 0)
+        return cls(args.Object, args.Parallax, args.Teff, args.AngDia, args.Model, args.UseStored != 'n', position)
+
+
+def query_sed(pos, radius=1, use_stored=False):
     """ Query VizieR Photometry
     The VizieR photometry tool extracts photometry points around a given position
     or object name from photometry-enabled catalogs in VizieR.
@@ -209,6 +125,8 @@ def query_sed(pos, radius=1):
         position tuple or object name
     radius: float
         position matching in arseconds.
+    use_stored: bool
+        reuse the VizierSED CSV saved by an earlier run (smallest radius) instead of querying VizieR.
     Returns
     -------
     table: astropy.Table
@@ -224,28 +142,49 @@ def query_sed(pos, radius=1):
     except:
         target = pos
 
+    # Use stored VizierSED data if available, skipping the VizieR query
+    if use_stored:
+        # Stored files are named <target>_<radius>.csv, skip any other file matching the glob
+        cache_name = re.compile(re.escape(target) + r'_(\d+(\.\d+)?)\.csv$')
+        cache_files = {}
+        for cache_file in glob.glob('Data/Photometry/VizierSED/' + glob.escape(target) + '_*.csv'):
+            cache_match = cache_name.match(os.path.basename(cache_file))
+            if cache_match:
+                cache_files[cache_file] = float(cache_match.group(1))
+        if cache_files:
+            cache_file = min(cache_files, key=cache_files.get)
+            print('Stored VizierSED data = ', cache_file)
+            table_df = pd.read_csv(cache_file)
+            obs_table = table_df.rename(columns={"_tabname": "src", "sed_flux": "fl", "sed_eflux": "efl", "sed_filter": "band"})
+            return obs_table, "None"
+
     #url = "http:///viz-bin/sed?-c={target:s}&-c.rs={radius:f}"
     host = "vizier.u-strasbg.fr"
     port = 80
     viz_err = "None"
+    # One VizieR connection for this query, closed once the radius loop is done
+    connection = HTTPConnection(host, port)
     while True:  # Added while, try, except loop to avoid errors at small radius
         viz_err = "None"            
         print('Current Radius = ', radius)
         try:
             path = "/viz-bin/sed?-c={target:s}&-c.rs={radius:f}".format(target=target, radius=radius)
-            connection = HTTPConnection(host, port)
             connection.request("GET", path)
             response = connection.getresponse()
             table = Table.read(BytesIO(response.read()), format="votable")
-        except Exception as viz_err: 
+        except Exception as err:
+            viz_err = err
             print('VizierSED Error = ', viz_err)
-            radius += 1
-            if radius > 20:
+            connection.close()    # Reset connection in case it was left in a bad state
+            connection = HTTPConnection(host, port)
+            if radius >= 20:
                 print('radius limit break')
                 break
+            radius = min(math.ceil(radius * 1.5), 20)   # Grow radius 1, 2, 3, 5, 8, 12, 18, 20
         else:
             print('clean break')
             break
+    connection.close()
     print('Vizier SED Radius (arcsec) = ', radius)
     print('Final VizierSED Error = ', viz_err)
     table_df = table.to_pandas()
@@ -279,58 +218,53 @@ def filter_wl(obs_data, wl_min, wl_max):
     return obs_data_range
 
 
-def Get_source_id(object_ID):
-    result_table = Simbad.query_objectids(object_ID)
+# Get GAIA source IDs from the Simbad IDS field ("|" separated list returned by Get_Simbad_data)
+def Get_source_id(simbad_ids):
     src_ID_name_3 = src_ID_3 = src_ID_name_2 = src_ID_2 ='NaN'
-    for x in result_table:
-        if 'Gaia EDR3' in x['ID']:
-            src_ID_name_3 = (x['ID'])
+    for x in simbad_ids.split('|'):
+        if 'Gaia EDR3' in x:
+            src_ID_name_3 = x
             print(src_ID_name_3)
-            src_ID_3 = x['ID'].replace('Gaia EDR3 ','')
-        if 'Gaia DR2' in x['ID']:
-            src_ID_name_2 = (x['ID'])
+            src_ID_3 = x.replace('Gaia EDR3 ','')
+        if 'Gaia DR2' in x:
+            src_ID_name_2 = x
             print(src_ID_name_2)
-            src_ID_2 = x['ID'].replace('Gaia DR2 ','')
+            src_ID_2 = x.replace('Gaia DR2 ','')
     return src_ID_name_3, src_ID_3, src_ID_name_2, src_ID_2
 
 
+# Returns Simbad data for store_all as a dict
 def Get_Simbad_data(object_ID):
     custom_Simbad = Simbad()
     custom_Simbad.add_votable_fields('ra(d)', 'dec(d)', 'plx', 'plx_error', 'flux(U)', 'flux_error(U)', 'flux(B)',
                                      'flux_error(B)', 'flux(V)', 'flux_error(V)', 'flux(R)', 'flux_error(R)', 'flux(G)',
                                      'flux_error(G)', 'flux(I)', 'flux_error(I)', 'flux(J)', 'flux_error(J)', 'flux(H)',
                                      'flux_error(H)', 'flux(K)', 'flux_error(K)',
-                                     'diameter', 'distance')
+                                     'diameter', 'distance', 'ids')   # ids used for GAIA source IDs (saves a query)
     object_table = custom_Simbad.query_object(object_ID)
-    store_all['RA_S'] = RA = object_table['RA_d'][0]
-    store_all['DEC_S'] = DEC = object_table['DEC_d'][0]
-    store_all['PLX_S'] = plx_simbad = object_table['PLX_VALUE'][0]
-    store_all['PLX_ERR_S'] = plx_err_simbad = object_table['PLX_ERROR'][0]
-    store_all['FLUX_U_S'] = (object_table['FLUX_U'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_U_S'] = (object_table['FLUX_ERROR_U'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_B_S'] = (object_table['FLUX_B'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_B_S'] = (object_table['FLUX_ERROR_B'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_V_S'] = (object_table['FLUX_V'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_V_S'] = (object_table['FLUX_ERROR_V'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_R_S'] = (object_table['FLUX_R'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_R_S'] = (object_table['FLUX_ERROR_R'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_G_S'] = (object_table['FLUX_G'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_G_S'] = (object_table['FLUX_ERROR_G'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_I_S'] = (object_table['FLUX_I'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_I_S'] = (object_table['FLUX_ERROR_I'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_J_S'] = (object_table['FLUX_J'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_J_S'] = (object_table['FLUX_ERROR_J'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_H_S'] = (object_table['FLUX_H'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_H_S'] = (object_table['FLUX_ERROR_H'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_K_S'] = (object_table['FLUX_K'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['FLUX_ERR_K_S'] = (object_table['FLUX_ERROR_K'][0] * u.ABmag).to(u.erg/u.s/u.cm**2/u.Hz) * 1e23
-    store_all['DIA_S'] = dia_simbad = object_table['Diameter_diameter'][0]
-    store_all['DIA_UNIT_S'] = dia_unit_simbad = object_table['Diameter_unit'][0]
-    store_all['DIST_S'] = dist_simbad = object_table['Distance_distance'][0]
-    store_all['DIST_UNIT_S'] = dist_unit_simbad = object_table['Distance_unit'][0]
-    return RA, DEC, plx_simbad, plx_err_simbad
-
-
+    simbad_data = {}
+    simbad_data['RA_S'] = RA = object_table['RA_d'][0]
+    simbad_data['DEC_S'] = DEC = object_table['DEC_d'][0]
+    simbad_data['PLX_S'] = plx_simbad = object_table['PLX_VALUE'][0]
+    simbad_data['PLX_ERR_S'] = plx_err_simbad = object_table['PLX_ERROR'][0]
+    # Convert Simbad AB magnitudes to flux (Jy) for all bands at once (masked magnitudes are used as 0 mag)
+    bands = ['U', 'B', 'V', 'R', 'G', 'I', 'J', 'H', 'K']
+    mags = np.array([np.ma.filled(object_table['FLUX_' + b], 0)[0] for b in bands], dtype=float)
+    mag_errs = np.array([np.ma.filled(object_table['FLUX_ERROR_' + b], 0)[0] for b in bands], dtype=float)
+    flux_jy = 10**(-0.4 * (mags + 48.6)) * 1e23   # AB mag to erg/s/cm**2/Hz, then to Jy
+    flux_err_jy = 10**(-0.4 * (mag_errs + 48.6)) * 1e23
+    for b, flux, flux_err in zip(bands, flux_jy, flux_err_jy):
+        simbad_data['FLUX_' + b + '_S'] = flux
+        simbad_data['FLUX_ERR_' + b + '_S'] = flux_err
+    simbad_data['DIA_S'] = dia_simbad = object_table['Diameter_diameter'][0]
+    simbad_data['DIA_UNIT_S'] = dia_unit_simbad = object_table['Diameter_unit'][0]
+    simbad_data['DIST_S'] = dist_simbad = object_table['Distance_distance'][0]
+    simbad_data['DIST_UNIT_S'] = dist_unit_simbad = object_table['Distance_unit'][0]
+    simbad_ids = str(object_table['IDS'][0])
+    return RA, DEC, plx_simbad, plx_err_simbad, simbad_ids, simbad_data
+
+
+# Returns GAIA data for store_all as a dict (empty if source_ID not found)
 def Get_Gaia_data(source_ID, release):
     if release == 'dr2':
         columns = 'source_id, ra, dec, parallax, parallax_error, teff_val, teff_percentile_lower, teff_percentile_upper,' \
@@ -347,125 +281,145 @@ def Get_Gaia_data(source_ID, release):
     query = query_base.format(columns=columns, source_ID=source_ID, release=release)
     job = Gaia.launch_job_async(query)
     results = job.get_results()
-    i = 0
-    for x in results:
-        i += 1
+    i = len(results)   # Number of rows found for source_ID
     print("i =", i)
+    gaia_data = {}
     if i == 1:
         if release == 'edr3':
-            store_all['RA_edr3'] = ra = results['ra'][0]
-            store_all['DEC_edr3'] = dec = results['dec'][0]
-            store_all['PLX_edr3'] = plx = results['parallax'][0]
-            store_all['PLX_ERR_edr3'] = plx_err = results['parallax_error'][0]
+            gaia_data['RA_edr3'] = ra = results['ra'][0]
+            gaia_data['DEC_edr3'] = dec = results['dec'][0]
+            gaia_data['PLX_edr3'] = plx = results['parallax'][0]
+            gaia_data['PLX_ERR_edr3'] = plx_err = results['parallax_error'][0]
         if release == 'dr3':
-            store_all['RA_dr3'] = ra = results['ra'][0]
-            store_all['DEC_dr3'] = dec = results['dec'][0]
-            store_all['PLX_dr3'] = plx = results['parallax'][0]
-            store_all['PLX_ERR_dr3'] = plx_err = results['parallax_error'][0]
+            gaia_data['RA_dr3'] = ra = results['ra'][0]
+            gaia_data['DEC_dr3'] = dec = results['dec'][0]
+            gaia_data['PLX_dr3'] = plx = results['parallax'][0]
+            gaia_data['PLX_ERR_dr3'] = plx_err = results['parallax_error'][0]
         if release == 'dr2':
-            store_all['RA_dr2'] = ra = results['ra'][0]
-            store_all['DEC_dr2'] = dec = results['dec'][0]
-            store_all['PLX_dr2'] = plx = results['parallax'][0]
-            store_all['PLX_ERR_dr2'] = plx_err = results['parallax_error'][0]
-            store_all['TEFF_dr2'] = Teff = results['teff_val'][0]
-            store_all['TEFF_NEG_dr2'] = Teff_neg = results['teff_percentile_lower'][0]
-            store_all['TEFF_POS_dr2'] = Teff_pos = results['teff_percentile_upper'][0]
-            store_all['RSTAR_dr2'] = Rstar = results['radius_val'][0]
-            store_all['RSTAR_NEG_dr2'] = Rstar_neg = results['radius_percentile_lower'][0]
-            store_all['RSTAR_POS_dr2'] = Rstar_pos = results['radius_percentile_lower'][0]
-            store_all['LSTAR_dr2'] = Lstar = results['lum_val'][0]
-            store_all['LSTAR_NEG_dr2'] = Lstar_neg = results['lum_percentile_lower'][0]
-            store_all['LSTAR_POS_dr2'] = Lstar_pos = results['lum_percentile_lower'][0]
+            gaia_data['RA_dr2'] = ra = results['ra'][0]
+            gaia_data['DEC_dr2'] = dec = results['dec'][0]
+            gaia_data['PLX_dr2'] = plx = results['parallax'][0]
+            gaia_data['PLX_ERR_dr2'] = plx_err = results['parallax_error'][0]
+            gaia_data['TEFF_dr2'] = Teff = results['teff_val'][0]
+            gaia_data['TEFF_NEG_dr2'] = Teff_neg = results['teff_percentile_lower'][0]
+            gaia_data['TEFF_POS_dr2'] = Teff_pos = results['teff_percentile_upper'][0]
+            gaia_data['RSTAR_dr2'] = Rstar = results['radius_val'][0]
+            gaia_data['RSTAR_NEG_dr2'] = Rstar_neg = results['radius_percentile_lower'][0]
+            gaia_data['RSTAR_POS_dr2'] = Rstar_pos = results['radius_percentile_lower'][0]
+            gaia_data['LSTAR_dr2'] = Lstar = results['lum_val'][0]
+            gaia_data['LSTAR_NEG_dr2'] = Lstar_neg = results['lum_percentile_lower'][0]
+            gaia_data['LSTAR_POS_dr2'] = Lstar_pos = results['lum_percentile_lower'][0]
         else:
             Teff = Teff_neg = Teff_pos = 'NaN'
     else:
         ra = dec = plx = plx_err = Teff = Teff_neg = Teff_pos ='NaN'
-    return ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos
+    return ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos, gaia_data
 
 
+# Returns Simbad & GAIA data for store_all as a dict and all parallaxes found as a dict of (plx, plx_err, plx_pre)
 def get_VO_Data(source_name):
     # Keep a running sum weighted average numerator (sum plx * 1/ plx_err**2) and reciprocal of plx_err**2
     plx_wav_sum_num = plx = 0    # Initial value of Numerator
     plx_err_wav_sum = plx_err = 0    # Initial value of Reciprocal of plx_err**2
-    store_all['RSTAR_dr2'] ='NaN'
-    store_data = pd.DataFrame([])
+    vo_data = {'RSTAR_dr2': 'NaN'}
+    plx_data = {}
     try:
-        RA, DEC, plx_simbad, plx_err_simbad = Get_Simbad_data(source_name)
+        RA, DEC, plx_simbad, plx_err_simbad, simbad_ids, simbad_data = Get_Simbad_data(source_name)
     except:
         print("Simbad Error")
     else:
         print("Simbad", RA, DEC, plx_simbad, plx_err_simbad)
+        vo_data.update(simbad_data)
         if isinstance(plx_simbad, float): 
-            plx_data.loc['Simbad'] = [plx_simbad, plx_err_simbad, plx_err_simbad / plx_simbad]
+            plx_data['Simbad'] = (plx_simbad, plx_err_simbad, plx_err_simbad / plx_simbad)
         plx_wav_sum_num = plx_wav_sum_num + plx_simbad * (1 / plx_err_simbad ** 2)  # Add Simbad plx to numerator
         plx_err_wav_sum = plx_err_wav_sum + (1 / plx_err_simbad ** 2)  # Add Simbad plx_err to reciprocal of plx_err**2
 #    finally:
-        src_ID_name_3, src_ID_3, src_ID_name_2, src_ID_2 = Get_source_id(source_name)
+        src_ID_name_3, src_ID_3, src_ID_name_2, src_ID_2 = Get_source_id(simbad_ids)
         # ra = "NaN"
         if src_ID_3 != "NaN":
             # Get data from GAIA DR3 VO tables
             release = 'dr3'
-            store_all['SOURCE_ID_3'] = src_ID_name_3
+            vo_data['SOURCE_ID_3'] = src_ID_name_3
             print(src_ID_3)
-            ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos = Get_Gaia_data(src_ID_3, release)
+            ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos, gaia_data = Get_Gaia_data(src_ID_3, release)
             print("GAIA DR3", ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos)
+            vo_data.update(gaia_data)
             if isinstance(plx, float): 
-                plx_data.loc['GAIA DR3'] = [plx, plx_err, plx_err / plx]
+                plx_data['GAIA DR3'] = (plx, plx_err, plx_err / plx)
             if plx != 0:
                 plx_wav_sum_num = plx_wav_sum_num + plx * (1 / plx_err ** 2)   # Add dr3 plx to numerator
                 plx_err_wav_sum = plx_err_wav_sum + (1 / plx_err ** 2)     # Add dr3 plx_err to reciprocal of plx_err**2
             # Get data from GAIA EDR3 VO tables
             release = 'edr3'
-            ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos = Get_Gaia_data(src_ID_3, release)
+            ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos, gaia_data = Get_Gaia_data(src_ID_3, release)
             print("GAIA EDR3", ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos)
+            vo_data.update(gaia_data)
             if isinstance(plx, float): 
-                plx_data.loc['GAIA EDR3'] = [plx, plx_err, plx_err / plx]
+                plx_data['GAIA EDR3'] = (plx, plx_err, plx_err / plx)
             if plx != 0:
                 plx_wav_sum_num = plx_wav_sum_num + plx * (1 / plx_err ** 2)   # Add edr3 plx to numerator
                 plx_err_wav_sum = plx_err_wav_sum + (1 / plx_err ** 2)     # Add edr3 plx_err to reciprocal of plx_err**2
         if src_ID_2 != "NaN":
             # Get data from GAIA DR2 VO tables
             release = 'dr2'
-            store_all['SOURCE_ID_2'] = src_ID_name_2
+            vo_data['SOURCE_ID_2'] = src_ID_name_2
             print(src_ID_2)
-            ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos = Get_Gaia_data(src_ID_2, release)
+            ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos, gaia_data = Get_Gaia_data(src_ID_2, release)
             print("GAIA DR2", ra, dec, plx, plx_err, Teff, Teff_neg, Teff_pos)
+            vo_data.update(gaia_data)
             if isinstance(plx, float): 
-                plx_data.loc['GAIA DR2'] = [plx, plx_err, plx_err / plx]
+                plx_data['GAIA DR2'] = (plx, plx_err, plx_err / plx)
             if plx != 0:
                 plx_wav_sum_num = plx_wav_sum_num + plx * (1 / plx_err ** 2)   # Add dr2 plx to numerator
                 plx_err_wav_sum = plx_err_wav_sum + (1 / plx_err ** 2)     # Add dr2 plx_err to reciprocal of plx_err**2
-        store_all['PLX_WAVG'] = plx = plx_wav_sum_num / plx_err_wav_sum
-        store_all['PLX_ERR_WAVG'] = plx_err = 1 / np.sqrt(plx_err_wav_sum)
-        store_data = store_data.append(store_all)
-        store_data.to_csv('Data/GAIA_data.csv', index=False)
+        vo_data['PLX_WAVG'] = plx = plx_wav_sum_num / plx_err_wav_sum
+        vo_data['PLX_ERR_WAVG'] = plx_err = 1 / np.sqrt(plx_err_wav_sum)
+        # Per-star file, batch stars run concurrently and would overwrite a shared one
+        pd.DataFrame([dict({'Source': source_name}, **vo_data)]).to_csv('Data/Run_Data/' + source_name + '_GAIA_data.csv', index=False)
 
-    return RA, DEC, plx, plx_err
+    return RA, DEC, plx, plx_err, vo_data, plx_data
+
+
+# Index of the nearest wl in the (sorted) model wl grid for every obs wl
+def nearest_wave_idx(waves, wl):
+    waves = np.ascontiguousarray(waves, dtype=np.float64)
+    index = np.clip(np.searchsorted(waves, wl), 1, len(waves) - 1)
+    take_left = (wl - waves[index - 1]) <= (waves[index] - wl)   # ties go to lower wl, same as argmin
+    return np.where(take_left, index - 1, index)
 
 
 # Clean up data until min number of fit points found
-def get_clean_data(observed_data, fit_curve, fit_err_init, fit_pts_min):
+# wave_idx (from nearest_wave_idx) can be passed in when the fit curve wl grid is already known
+def get_clean_data(observed_data, fit_curve, fit_err_init, fit_pts_min, wave_idx=None):
     fit_err = fit_err_init
     fit_pts = 0
     long_wl = False
-    while fit_pts < fit_pts_min or not long_wl:
 
-        # Clean up observed data not near fit curve
-        fit_data = []
-        for i in range(len(observed_data)):
-            index = np.argmin(np.abs(fit_curve.waves - observed_data.wl[i]))  # find index where fit wl = obs wl
-            fit_data.append(fit_curve.fluxes[index])  # get fit flux at obs wl
-
-        comp_data = observed_data
-        comp_data['fit'] = pd.Series(fit_data, index=comp_data.index)  # append fit flux column
-        comp_data['abs_dif'] = abs((comp_data['fl'] - comp_data['fit'])/comp_data['fl'])  # append abs % diff column
-        comp_data['pct_dif'] = (comp_data['fl'] - comp_data['fit'])/comp_data['fl']  # append % diff column
-        good_data = comp_data[comp_data.abs_dif < fit_err]  # good data = dif less than fit error
-        bad_data = comp_data[comp_data.abs_dif > fit_err]  # bad data = dif greater than fit error
-        fit_pts = len(good_data)
+    # Fit flux at the nearest fit wl for every obs wl
+    wl = observed_data['wl'].to_numpy()
+    if wave_idx is None:
+        wave_idx = nearest_wave_idx(fit_curve.waves, wl)
+    fit = fit_curve.fluxes[wave_idx]
+    fl = observed_data['fl'].to_numpy()
+    pct_dif = (fl - fit) / fl
+    abs_dif = np.abs(pct_dif)
+
+    # Clean up observed data not near fit curve
+    while fit_pts < fit_pts_min or not long_wl:
+        good = abs_dif < fit_err  # good data = dif less than fit error
+        bad = abs_dif > fit_err  # bad data = dif greater than fit error
+        fit_pts = int(good.sum())
         fit_err = fit_err + 0.01
-        fit_qual = good_data['abs_dif'].sum()/len(good_data)
-        long_wl = (good_data['wl'] > 2).any()        
+        fit_qual = abs_dif[good].mean()
+        long_wl = bool(np.any(wl[good] > 2))
+
+    # Build good & bad data tables only once the fit error is settled,
+    # straight from the masked column arrays (one copy per column, already numbered from 0)
+    comp_cols = {col: observed_data[col].to_numpy() for col in observed_data.columns}
+    comp_cols.update(fit=fit, abs_dif=abs_dif, pct_dif=pct_dif)  # append fit flux & % diff columns
+    good_data = pd.DataFrame({col: values[good] for col, values in comp_cols.items()})
+    bad_data = pd.DataFrame({col: values[bad] for col, values in comp_cols.items()})
     print("fit_pts ", fit_pts)
     print("fit_err ", fit_err)
     print("fit_qual ", fit_qual)
@@ -474,9 +428,24 @@ def get_clean_data(observed_data, fit_curve, fit_err_init, fit_pts_min):
 
 
 # Use Stored Photometry Data
-def get_stored_data(fit_err_init, fit_pts_min):
-    good_data = pd.read_csv('Data/Photometry/' + starmodel + '/' + sname + '_good_data.csv')
-    bad_data = pd.read_csv('Data/Photometry/' + starmodel + '/' + sname + '_bad_data.csv')
+# Replace missing (NaN) or zero flux errors with 10% of the flux, using one mask over the column
+def fill_flux_err(good_data):
+    good_fl = good_data['fl'].to_numpy()
+    good_efl = good_data['efl'].to_numpy(dtype=np.float64, copy=True)
+    no_err = np.isnan(good_efl) | (good_efl == 0)
+    good_efl[no_err] = good_fl[no_err] * 0.1
+    good_data['efl'] = good_efl
+    return good_data
+
+
+def get_stored_data(sname, starmodel, fit_err_init, fit_pts_min):
+    # Only read the columns used for the fit, tables and fit diagnostics, with fixed dtypes
+    stored_cols = ['wl', 'fl', 'efl', 'src', 'band', 'fit', 'abs_dif', 'pct_dif']
+    stored_dtypes = {'wl': np.float64, 'fl': np.float64, 'efl': np.float64, 'src': str, 'band': str}
+    good_data = pd.read_csv('Data/Photometry/' + starmodel + '/' + sname + '_good_data.csv',
+                            usecols=lambda c: c in stored_cols, dtype=stored_dtypes)
+    bad_data = pd.read_csv('Data/Photometry/' + starmodel + '/' + sname + '_bad_data.csv',
+                           usecols=lambda c: c in stored_cols, dtype=stored_dtypes)
     fit_pts = len(good_data)
     bad_cnt = len(bad_data)
     fit_err = fit_err_init + (fit_pts - fit_pts_min)*0.01
@@ -486,7 +455,18 @@ def get_stored_data(fit_err_init, fit_pts_min):
     return good_data, bad_data, fit_pts, fit_err, fit_qual, bad_cnt
 
 
-def plot_obs(itr, input_data, gx, gy, bx, by):
+# Render figure to an in-memory PNG for the PDF report (also written to Data/Figures if save_figures is set)
+def fig_to_png(fig, file_name):
+    png = BytesIO()
+    fig.savefig(png, format='png')
+    if save_figures:
+        with open('Data/Figures/' + file_name + '.png', 'wb') as png_file:
+            png_file.write(png.getvalue())
+    png.seek(0)
+    return png
+
+
+def plot_obs(itr, source_name, obs_ylim, good_data, bad_data, fit_star, bl_star, theta_max, Teff_bmk, ang_dia_bmk):
     fig2 = plt.figure("Observed  " + str(itr), figsize=(8,6), dpi=100)
     ax2 = fig2.add_subplot(111)
     ax2.grid(True, lw=0.2)
@@ -496,50 +476,32 @@ def plot_obs(itr, input_data, gx, gy, bx, by):
     # Plot observed data
     # input_data_range = input_data[(wl_min <= input_data.wl) & (input_data.wl <= wl_max)]
     # Plot good observed data
-    ax2.loglog(gx,gy, 'ob', ms=3)
+    ax2.loglog(good_data.wl, good_data.fl, 'ob', ms=3)
     # Plot bad observed data
-    ax2.loglog(bx,by, 'xr', ms=6)
+    ax2.loglog(bad_data.wl, bad_data.fl, 'xr', ms=6)
     # Plot SED_EMCEE Best fit curve
     ax2.plot(fit_star.waves, fit_star.fluxes, 'b-', linewidth=0.5, alpha=0.8)
     # Plot SEDfit curve
     # ax2.plot(s.star.waves, s.star.fluxes, 'k-', linewidth=0.3, alpha=0.8)
     # Plot Benchmark Star best fit curve
     ax2.plot(bl_star.waves, bl_star.fluxes, 'g-', linewidth=0.5, alpha=0.8)
-    # Set x & y limits to plot
-    ymin = 0.3*np.min(np.abs(input_data.fl))
-    ymax = 7.0*np.max(input_data.fl)
+    # Set x & y limits to plot (obs_ylim is computed once from the observed data in the main routine)
     ax2.set_xlim(0.2, 500.0)
-    ax2.set_ylim(ymin=ymin, ymax=ymax)
+    ax2.set_ylim(*obs_ylim)
     ax2.set_autoscale_on(False)
 
 # Add labels to Observed Data
-    pt_i = -1
-    for x,y in zip(good_data.wl, good_data.fl):
-        pt_i += 1
-        x_off = -3
-        y_off = 2
-        ha_value = "left"
-        # label = "({0:.2f},{1:.2f})".format(x,y)
-        # if pt_i in bad_data_idx:
-        plt.annotate(pt_i,  # this is the text
-                     (x, y),  # this is the point to label
-                     color='black', fontsize=6,  # set fontsize
-                     textcoords="offset points",  # how to position the text
-                     xytext=(x_off+0, y_off+0),  # distance from text to points (x,y)
-                     ha=ha_value)  # horizontal alignment can be left, right or center
-        # else:
-    pt_i = -1
-    for x,y in zip(bad_data.wl, bad_data.fl):
-        pt_i += 1
-        x_off = -3
-        y_off = 2
-        ha_value = "left"
-        plt.annotate(pt_i,  # this is the text
-                     (x, y),  # this is the point to label
-                     color='red', fontsize=6,  # set fontsize
-                     textcoords="offset points",  # how to position the text
-                     xytext=(x_off+0, y_off+0),  # distance from text to points (x,y)
-                     ha=ha_value)  # horizontal alignment can be left, right or center
+    if annotate_points:
+        for data, color in [(good_data, 'black'), (bad_data, 'red')]:
+            wl_arr = data['wl'].to_numpy()
+            fl_arr = data['fl'].to_numpy()
+            for pt_i, (x, y) in enumerate(zip(wl_arr, fl_arr)):
+                ax2.annotate(pt_i,  # this is the text
+                             (x, y),  # this is the point to label
+                             color=color, fontsize=6,  # set fontsize
+                             textcoords="offset points",  # how to position the text
+                             xytext=(-3, 2),  # distance from text to points (x,y)
+                             ha="left")  # horizontal alignment can be left, right or center
 
     # Annotate
     # anno_text = r'$T_{SED}$ = %.0f' % (sfit_tstar)
@@ -552,21 +514,24 @@ def plot_obs(itr, input_data, gx, gy, bx, by):
              horizontalalignment='left', verticalalignment='bottom', transform=ax2.transAxes)
     # Show Figure and save to file
     # plt.gcf().set_size_inches(*fig_size)  # Needed to ensure figure size remains large
-    fig2.savefig('Data/Figures/' + source_name + '_Observed_' + str(itr))
+    obs_png = fig_to_png(fig2, source_name + '_Observed_' + str(itr))
     plt.close()
+    return obs_png
 
 
 # Create Table of Observed data
-def plot_obs_table(itr):
-    fig_table = plt.figure("Observed Table" + str(itr), figsize=(8, 6), dpi=100)
+def plot_obs_table(itr, source_name, good_data, bad_data):
+    fig_table = plt.figure("Observed Table", figsize=(8, 6), dpi=100)
+    fig_table.clf()    # Reuse the same figure for every iteration and model
     # Hide axes
     ax = plt.gca()
     ax.get_xaxis().set_visible(False)
     ax.get_yaxis().set_visible(False)
     # Hide axes border
     plt.box(on=None)
-    table1_data = good_data[['wl', 'fl', 'efl', 'src', 'band']]
-    table1_data.update(table1_data[['wl', 'fl', 'efl']].applymap('{:,.2f}'.format))
+    table1_data = good_data[['wl', 'fl', 'efl', 'src', 'band']].copy()
+    for col in ['wl', 'fl', 'efl']:    # Format whole columns at once
+        table1_data[col] = np.char.mod('%.2f', table1_data[col].to_numpy(dtype=np.float64))
     table1 = plt.table(cellText=table1_data.values, cellLoc='center',
                        colWidths=[0.09, 0.08, 0.09, 0.23, 0.16],
                        colLabels=table1_data.columns,
@@ -576,8 +541,9 @@ def plot_obs_table(itr):
     table1.set_fontsize(6)
     table1.scale(.7, 1)
     if len(bad_data) != 0:
-        table2_data = bad_data[['wl', 'fl', 'efl', 'src', 'band']]
-        table2_data.update(table2_data[['wl', 'fl', 'efl']].applymap('{:,.2f}'.format))
+        table2_data = bad_data[['wl', 'fl', 'efl', 'src', 'band']].copy()
+        for col in ['wl', 'fl', 'efl']:    # Format whole columns at once
+            table2_data[col] = np.char.mod('%.2f', table2_data[col].to_numpy(dtype=np.float64))
         rcolor=plt.cm.Reds(0.4)
         table2 = plt.table(cellText=table2_data.values, cellLoc='center',
                            colWidths=[0.09, 0.08, 0.09, 0.23, 0.16],
@@ -589,13 +555,14 @@ def plot_obs_table(itr):
         table2.scale(.7, 1)
     # Show Figure and save to file
     # plt.gcf().set_size_inches(*fig_size)  # Needed to ensure figure size remains large
-    fig_table.savefig('Data/Figures/' + source_name + '_Observed_Table' + str(itr))
+    table_png = fig_to_png(fig_table, source_name + '_Observed_Table' + str(itr))
     # plt.close()
+    return table_png
 
 
 # Plot SEDfit best fit curve and observed data on LogLog Axis
 def plot_SEDfit_obs(gx, gy, bx, by):
-    fig2 = plt.figure("SEDfit", figsize=(8, 6), dpi=100)
+    fig2 = plt.figure("SEDfit", figsize=(20, 15), dpi=100)   # Large figure, sized once at creation
     ax2 = fig2.add_subplot(111)
     ax2.grid(True, lw=0.2)
     ax2.set_title(label=source_name)
@@ -614,14 +581,15 @@ def plot_SEDfit_obs(gx, gy, bx, by):
     anno_text += '\n' + r'$Fit Error$ = %.3f' % (fit_err)
     ax2.text(0.99, 0.99, anno_text, bbox=dict(facecolor='w', alpha=0.2), linespacing=1.0, \
              horizontalalignment='right', verticalalignment='top', transform=ax2.transAxes)
-    plt.gcf().set_size_inches(*fig_size)  # Needed to ensure figure size remains large
-    fig2.savefig('Data/Figures/' + source_name + '_Observed')
+    sedfit_png = fig_to_png(fig2, source_name + '_Observed')
     # plt.close()
+    return sedfit_png
 
 
 # Plot SED_EMCEE Best Fit curve and Observed Data on LogLog Axis
-def plot_SED_EMCEE_obs(gx, gy, bx, by, itr):
-    fig3 = plt.figure("SEDmc" + str(itr), figsize=(8, 6), dpi=100)
+def plot_SED_EMCEE_obs(gx, gy, bx, by, itr, fit_star, bl_star, obs_ylim):
+    fig3 = plt.figure("SEDmc", figsize=(8, 6), dpi=100)
+    fig3.clf()    # Reuse the same figure for every iteration and model
     ax3 = fig3.add_subplot(111)
     ax3.grid(True, lw=0.2)
     ax3.set_title(label=source_name + " - " + str(itr))
@@ -635,11 +603,9 @@ def plot_SED_EMCEE_obs(gx, gy, bx, by, itr):
     ax3.plot(fit_star.waves, fit_star.fluxes, 'b-', linewidth=0.5, alpha=0.8)
     # Plot Benchmark Star best fit curve
     ax3.plot(bl_star.waves, bl_star.fluxes, 'k-', linewidth=0.5, alpha=0.8)
-    # ... and set X and Y limits
-    ymin = 0.3*np.min(np.abs(obs_data.fl))
-    ymax = 7.0*np.max(obs_data.fl)
+    # ... and set X and Y limits (obs_ylim is computed once from the observed data in the main routine)
     ax3.set_xlim(0.2, 500.0)
-    ax3.set_ylim(ymin=ymin, ymax=ymax)
+    ax3.set_ylim(*obs_ylim)
     ax3.set_autoscale_on(False)
     # Annotate
     anno_text = ' Max Likelihood '
@@ -651,14 +617,16 @@ def plot_SED_EMCEE_obs(gx, gy, bx, by, itr):
     anno_text += '\n' + r'$Fit Quality$ = %.3f' % (fit_qual)
     ax3.text(0.78, 0.99, anno_text, bbox=dict(facecolor='w', alpha=0.2), linespacing=1.0, \
              horizontalalignment='left', verticalalignment='top', transform=ax3.transAxes)
-    fig3.savefig('Data/Figures/' + source_name + '_fit-' + str(itr))
-    plt.close()
+    fit_png = fig_to_png(fig3, source_name + '_fit-' + str(itr))
+    return fit_png
 
 
 # View Sampler Behavior
 def plot_chain(itr):
     # Look at sampler chain plots to see sampler behavior.
-    fig, axes = plt.subplots(2, figsize=(10, 7), sharex=True)
+    fig = plt.figure("Chain", figsize=(10, 7))
+    fig.clf()    # Reuse the same figure for every iteration and model
+    axes = fig.subplots(2, sharex=True)
     samples = sampler.get_chain()
     labels = ["Teff", "Radius"]
     for i in range(ndim):
@@ -668,21 +636,29 @@ def plot_chain(itr):
         ax.set_ylabel(labels[i])
         ax.yaxis.set_label_coords(-0.1, 0.5)
     axes[-1].set_xlabel("step number");
-    plt.savefig('Data/Figures/' + source_name + '_chain-' + str(itr))
-    plt.close()
+    chain_png = fig_to_png(fig, source_name + '_chain-' + str(itr))
+    return chain_png
 
 
 # # Corner Plot
-def plot_corner(itr):
+def plot_corner(itr, mcmc_pct, tau):
     # Show Posterior distribution spread in corner plot for temp index and scale values
     labels = ['Teff', 'Radius']
-    fig = plt.figure(figsize=(6, 6), dpi=100)
-    fig = corner.corner(samples, show_titles=False, labels=labels, plot_datapoints=True, quantiles=[0.16, 0.5, 0.84],
-                        fig=fig)
+    fig = plt.figure("Corner", figsize=(6, 6), dpi=100)
+    fig.clf()    # Reuse the same figure for every iteration and model
+    # Plot the chain thinned by the autocorrelation time (nearly independent samples, far fewer points to draw)
+    thin_by = max(1, int(np.nanmin(tau))) if np.isfinite(tau).any() else 1
+    fig = corner.corner(sampler.get_chain(thin=thin_by, flat=True), show_titles=False, labels=labels,
+                        plot_datapoints=True, fig=fig)
+    # Mark the shared 16/50/84 percentiles on the 1D histograms (same lines as corner's quantiles, not recomputed)
+    for ax, pct in zip(np.array(fig.axes).reshape((ndim, ndim)).diagonal(), mcmc_pct):
+        for q in pct:
+            ax.axvline(q, ls="dashed", color="k")
     # Disabled titles in corner plot since labels didn't change with quantiles. Plotted manual titles below.
+    mcmc_q = np.diff(mcmc_pct, axis=1)   # Lower & upper uncertainties for all parameters
     for i in range(ndim):
-        mcmc = np.percentile(samples[:, i], [16, 50, 84])
-        q = np.diff(mcmc)
+        mcmc = mcmc_pct[i]
+        q = mcmc_q[i]
         if i == 0:
             txt = "$\mathrm{{{3}}} = {0:.4g}_{{-{1:.3g}}}^{{+{2:.3g}}}$"
             txt = txt.format(mcmc[1], q[0], q[1], labels[i])
@@ -691,9 +667,8 @@ def plot_corner(itr):
             txt = "$\mathrm{{{3}}} = {0:.3g}_{{-{1:.3g}}}^{{+{2:.3g}}}$"
             txt = txt.format(mcmc[1], q[0], q[1], labels[i])
             fig.text(.6, .56, txt, fontsize=12, transform=plt.gcf().transFigure)
-    plt.savefig('Data/Figures/' + source_name + '_corner-' + str(itr))
-    plt.close()
-    return labels
+    corner_png = fig_to_png(fig, source_name + '_corner-' + str(itr))
+    return labels, corner_png
 
 
 # # Best Fit Value Summary
@@ -720,77 +695,90 @@ def print_summary(plx, plx_err):
 
 
 # Calculate Uncertainties & Plot
-def plot_sigmas(itr):
+def plot_sigmas(itr, mcmc_pct):
     # Show 2 sigma uncertainties for all parameters
     labels = ['Teff', 'Radius']
-    plt.figure(figsize=(2.2, 1.6))
+    fig = plt.figure("Sigmas", figsize=(2.2, 1.6))
+    fig.clf()    # Reuse the same figure for every iteration and model
     plt.annotate('     Median Values', xy=(0.05, 0.9), fontsize=9)
+    mcmc_q = np.diff(mcmc_pct, axis=1)   # Lower & upper uncertainties for all parameters
     for i in range(ndim):
-        mcmc = np.percentile(samples[:, i], [16, 50, 84])
-        q = np.diff(mcmc)
+        mcmc = mcmc_pct[i]
+        q = mcmc_q[i]
         if i == 0:
             txt = "$\mathrm{{{3}}} = {0:.4g}_{{-{1:.3g}}}^{{+{2:.3g}}}$"
             txt = txt.format(mcmc[1], q[0], q[1], labels[i])
             plt.annotate(txt, xy=(0.05, 0.70), fontsize=9)
-            teff_med = store_all[labels[i]] = int(mcmc[1])
-            teff_u_neg = store_all['u-(' + labels[i] + ')'] = int(q[0])
-            teff_u_plus = store_all['u+(' + labels[i] + ')'] = int(q[1])
-            teff_pct_u = store_all['u%(' + labels[i] + ')'] = round((100 * teff_u_plus / teff_med), 1)
+            teff_med = int(mcmc[1])
+            teff_u_neg = int(q[0])
+            teff_u_plus = int(q[1])
+            teff_pct_u = round((100 * teff_u_plus / teff_med), 1)
             if Teff_bl == 'NaN':
-                teff_med_pct_bl = store_all['Teff_delta_bl'] = 'NaN'
+                teff_med_pct_bl = 'NaN'
             else:
-                teff_med_pct_bl = store_all['Teff_delta_bl'] = round((100 * (teff_med - Teff_bl) / Teff_bl), 1)
+                teff_med_pct_bl = round((100 * (teff_med - Teff_bl) / Teff_bl), 1)
         if i == 1:
             # Plot and store radius with uncertainties
             txt = "$\mathrm{{{3}}} = {0:.3g}_{{-{1:.3g}}}^{{+{2:.3g}}}$"
             txt = txt.format(mcmc[1], q[0], q[1], labels[i])
-            Rstar_med = store_all[labels[i]] = float('{:.3g}'.format(mcmc[1]))
-            Rstar_u_neg = store_all['u-(' + labels[i] + ')'] = float('{:.3g}'.format(q[0]))
-            Rstar_u_plus = store_all['u+(' + labels[i] + ')'] = float('{:.3g}'.format(q[1]))
-            Rstar_pct_u = store_all['u%(' + labels[i] + ')'] = round((100 * Rstar_u_plus / Rstar_med), 1)
+            Rstar_med = float('{:.3g}'.format(mcmc[1]))
+            Rstar_u_neg = float('{:.3g}'.format(q[0]))
+            Rstar_u_plus = float('{:.3g}'.format(q[1]))
+            Rstar_pct_u = round((100 * Rstar_u_plus / Rstar_med), 1)
             if Rstar_bl == 'NaN':
-                Rstar_pct_bl = store_all['Radius_delta_bl'] = 'NaN'
+                Rstar_pct_bl = 'NaN'
             else:
-                Rstar_pct_bl = store_all['Radius_delta_bl'] = round((100 * (Rstar_med - Rstar_bl) / Rstar_bl), 1)
+                Rstar_pct_bl = round((100 * (Rstar_med - Rstar_bl) / Rstar_bl), 1)
             plt.annotate(txt, xy=(0.05, 0.5), fontsize=9)
-            # Derive, plot & store scale value from radius
-            scale_med = store_all['scale'] = float('{:.3g}'.format((Rstar_med * plx_mc / 1000)**2))
-            scale_u_neg = store_all['u-(scale)'] = float('{:.3g}'.format((np.sqrt(2 * (Rstar_u_neg / Rstar_med)**2
-                                                          + 2 * (plx_mc_err / plx_mc)**2))))
-            scale_u_plus = store_all['u+(scale)'] = float('{:.3g}'.format((np.sqrt(2 * (Rstar_u_plus / Rstar_med)**2
-                                                           + 2 * (plx_mc_err / plx_mc)**2))))
+            # Derive, plot & store scale value from radius (lower & upper uncertainties computed together)
+            Rstar_u = np.array([Rstar_u_neg, Rstar_u_plus])
+            scale_med = float('{:.3g}'.format((Rstar_med * plx_mc / 1000)**2))
+            scale_u = np.sqrt(2 * (Rstar_u / Rstar_med)**2 + 2 * (plx_mc_err / plx_mc)**2)
+            scale_u_neg = float('{:.3g}'.format(scale_u[0]))
+            scale_u_plus = float('{:.3g}'.format(scale_u[1]))
             txt = "$\mathrm{{{3}}} = {0:.3g}_{{-{1:.3g}}}^{{+{2:.3g}}}$"
             txt = txt.format(scale_med, scale_u_neg, scale_u_plus, 'scale')
             #plt.annotate(txt, xy=(0.05, 0.05), fontsize=9)
             # Derive, plot and store apparent radius (arcsec) with uncertainties
-            apprad_med = store_all['apprad'] = float('{:.3g}'.format(np.sqrt(scale_med)))
-            apprad_u_neg = store_all['u-(apprad)'] = float('{:.3g}'.format(.5 * scale_u_neg / np.sqrt(scale_med)))
-            apprad_u_plus = store_all['u+(apprad)'] = float('{:.3g}'.format(.5 * scale_u_plus / np.sqrt(scale_med)))
+            apprad_med = float('{:.3g}'.format(np.sqrt(scale_med)))
+            apprad_u_neg = float('{:.3g}'.format(.5 * scale_u_neg / np.sqrt(scale_med)))
+            apprad_u_plus = float('{:.3g}'.format(.5 * scale_u_plus / np.sqrt(scale_med)))
             txt = "$\mathrm{{{3}}} = {0:.3g}_{{-{1:.3g}}}^{{+{2:.3g}}}$"
             txt = txt.format(apprad_med, apprad_u_neg, apprad_u_plus, 'apprad')
             #plt.annotate(txt, xy=(0.05, 0.39), fontsize=9)
             # Derive, plot and store angular diameter (arcsec) with uncertianties
-            ang_dia_emc = store_all['angdia'] = float('{:.3g}'.format(4.65047 * 2 / 1000 * Rstar_med * plx_mc))
-            ang_dia_emc_u_neg = store_all['u-(angdia)'] = float('{:.2g}'.format(4.65047 * 2 /1000 * np.sqrt((Rstar_med * plx_mc_err)**2 + (plx_mc * Rstar_u_neg)**2)))
-            ang_dia_emc_u_plus = store_all['u+(angdia)'] = float('{:.2g}'.format(4.65047 * 2 / 1000 * np.sqrt((Rstar_med * plx_mc_err)**2 + (plx_mc * Rstar_u_plus)**2)))
-            ang_dia_emc_pct_u = store_all['u%(angdia)'] = round((100 * ang_dia_emc_u_plus / ang_dia_emc), 1)
+            ang_dia_emc = float('{:.3g}'.format(4.65047 * 2 / 1000 * Rstar_med * plx_mc))
+            ang_dia_emc_u = 4.65047 * 2 / 1000 * np.sqrt((Rstar_med * plx_mc_err)**2 + (plx_mc * Rstar_u)**2)
+            ang_dia_emc_u_neg = float('{:.2g}'.format(ang_dia_emc_u[0]))
+            ang_dia_emc_u_plus = float('{:.2g}'.format(ang_dia_emc_u[1]))
+            ang_dia_emc_pct_u = round((100 * ang_dia_emc_u_plus / ang_dia_emc), 1)
             if ang_dia_bl == 'NaN':
-                ang_dia_emc_pct_bl = store_all['angdia_delta_bl'] = 'NaN'
+                ang_dia_emc_pct_bl = 'NaN'
             else:
-                ang_dia_emc_pct_bl = store_all['angdia_delta_bl'] = round(
+                ang_dia_emc_pct_bl = round(
                 (100 * (ang_dia_emc - ang_dia_bl) / ang_dia_bl), 1)
             txt = "$\mathrm{{{3}}} = {0:.3g}_{{-{1:.3g}}}^{{+{2:.3g}}}$"
             txt = txt.format(ang_dia_emc, ang_dia_emc_u_neg, ang_dia_emc_u_plus, 'ang dia')
             plt.annotate(txt, xy=(0.05, 0.3), fontsize=9)
 
+    # Store all derived values at once
+    store_all.update({'Teff': teff_med, 'u-(Teff)': teff_u_neg, 'u+(Teff)': teff_u_plus, 'u%(Teff)': teff_pct_u,
+                      'Teff_delta_bl': teff_med_pct_bl,
+                      'Radius': Rstar_med, 'u-(Radius)': Rstar_u_neg, 'u+(Radius)': Rstar_u_plus, 'u%(Radius)': Rstar_pct_u,
+                      'Radius_delta_bl': Rstar_pct_bl,
+                      'scale': scale_med, 'u-(scale)': scale_u_neg, 'u+(scale)': scale_u_plus,
+                      'apprad': apprad_med, 'u-(apprad)': apprad_u_neg, 'u+(apprad)': apprad_u_plus,
+                      'angdia': ang_dia_emc, 'u-(angdia)': ang_dia_emc_u_neg, 'u+(angdia)': ang_dia_emc_u_plus,
+                      'u%(angdia)': ang_dia_emc_pct_u, 'angdia_delta_bl': ang_dia_emc_pct_bl})
+
     plt.xticks([])
     plt.yticks([])
     # plt.gcf().set_size_inches(3, 1.5)
-    plt.savefig('Data/Figures/' + source_name + '_2sigma-' + str(itr))
-    plt.close()
+    sigma_png = fig_to_png(fig, source_name + '_2sigma-' + str(itr))
     return teff_med, teff_u_neg, teff_u_plus, teff_med_pct_bl, scale_med, scale_u_neg, scale_u_plus, \
            apprad_med, apprad_u_neg, apprad_u_plus, ang_dia_emc, ang_dia_emc_u_neg, ang_dia_emc_u_plus, \
-           ang_dia_emc_pct_bl, Rstar_med, Rstar_u_neg, Rstar_u_plus, Rstar_bl, Rstar_pct_bl, ang_dia_emc_pct_u, teff_pct_u, Rstar_pct_u
+           ang_dia_emc_pct_bl, Rstar_med, Rstar_u_neg, Rstar_u_plus, Rstar_bl, Rstar_pct_bl, ang_dia_emc_pct_u, teff_pct_u, Rstar_pct_u, \
+           sigma_png
 
 
 def create_table(table_data, title='', data_size=8, title_size=9, align_data='L', align_header='C', cell_width='even',
@@ -876,6 +864,10 @@ def create_table(table_data, title='', data_size=8, title_size=9, align_data='L'
         header = table_data[0]
         data = table_data[1:]
 
+    # Convert table data to strings and emphasized data to a set once, not per cell
+    data = [[datum if isinstance(datum, str) else str(datum) for datum in row] for row in data]
+    emphasize_set = set(emphasize_data)
+
     line_height = pdf.font_size * 1.3
 
     col_width = get_col_widths()
@@ -933,7 +925,7 @@ def create_table(table_data, title='', data_size=8, title_size=9, align_data='L'
             if x_start:  # not sure if I need this
                 pdf.set_x(x_start)
             for datum in row:
-                if datum in emphasize_data:
+                if datum in emphasize_set:
                     pdf.set_text_color(*emphasize_color)
                     pdf.set_font(style=emphasize_style)
                     pdf.multi_cell(col_width, line_height, datum, border=0, align=align_data,
@@ -964,10 +956,8 @@ def create_table(table_data, title='', data_size=8, title_size=9, align_data='L'
             row = data[i]
             for i in range(len(row)):
                 datum = row[i]
-                if not isinstance(datum, str):
-                    datum = str(datum)
                 adjusted_col_width = col_width[i]
-                if datum in emphasize_data:
+                if datum in emphasize_set:
                     pdf.set_text_color(*emphasize_color)
                     pdf.set_font(style=emphasize_style)
                     pdf.multi_cell(adjusted_col_width, line_height, datum, border=0, align=align_data,
@@ -1036,14 +1026,14 @@ def pdf_header():
 
 
 # Add Plots to PDF Report ##
-def pdf_plots(itr):
+def pdf_plots(fit_png, sigma_png, table_png, chain_png, corner_png):
     # SEDmc Best Fit
     y1 = pdf.get_y()
     pdf.cell(35, 5, new_x=XPos.RIGHT, new_y=YPos.TOP, align="C")
-    pdf.image('Data/Figures/' + sname + '_fit-' + str(itr) + '.png', w=120)
+    pdf.image(fit_png, w=120)
     y2 = pdf.get_y()
     pdf.set_xy(68, y2-38)
-    pdf.image('Data/Figures/' + sname + '_2sigma-' + str(itr) + '.png', w=35)
+    pdf.image(sigma_png, w=35)
     pdf.set_y(y1+3)
     pdf.cell(0, 4, 'SEDmc Observed Data & Best Fit Curve', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
     pdf.set_xy(58, y2-5)
@@ -1068,7 +1058,7 @@ def pdf_plots(itr):
     y1 = pdf.get_y()
     # pdf.cell(22, 5, ln=0, align="C")
     pdf.cell(10, 1, new_x=XPos.RIGHT, new_y=YPos.TOP, align="C")
-    pdf.image('Data/Figures/' + sname + '_Observed_Table' + str(itr) + '.png', w=170)
+    pdf.image(table_png, w=170)
     # y2 = pdf.get_y()
     pdf.set_y(y1+7)
     pdf.cell(0, 4, 'Observed Data', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
@@ -1081,7 +1071,7 @@ def pdf_plots(itr):
     pdf.set_font('Helvetica', 'B', 10)
     y1 = pdf.get_y()
     pdf.cell(22, 5, new_x=XPos.RIGHT, new_y=YPos.TOP, align="C")
-    pdf.image('Data/Figures/' + sname + '_chain-' + str(itr) + '.png', w=150)
+    pdf.image(chain_png, w=150)
     y2 = pdf.get_y()
     pdf.set_y(y1+5)
     pdf.cell(0, 4, 'SEDmc Sampler Behavior - Markov Chain Plot', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
@@ -1094,15 +1084,23 @@ def pdf_plots(itr):
     pdf.set_font('Helvetica', 'B', 10)
     pdf.cell(0, 4, 'SEDmc Posterior Spread - Corner Plot', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
     pdf.cell(45, 5, new_x=XPos.RIGHT, new_y=YPos.TOP, align="C")
-    pdf.image('Data/Figures/' + sname + '_corner-' + str(itr) + '.png', w=100)
+    pdf.image(corner_png, w=100)
     # print pdf.get_x(), pdf.get_y()
 
 
+# Model spectrum [micron, Jy] (fluxes are owned by the spectrum and can be scaled in place)
+@dataclass
+class Spectrum:
+    waves: np.ndarray
+    fluxes: np.ndarray
+
+
 def find_enclosing_temps(temp,tlist):
     """For a given temperature <temp> and a list of model temperatures <tlist>,
-    find two model temperatures enclosing the given temperature."""
-    p = tlist < temp    # p is a boolean array
-    idx, = np.where( p[:-1] & ~p[1:] )[0]
+    find two model temperatures enclosing the given temperature (tlist is sorted)."""
+    idx = np.searchsorted(tlist, temp) - 1   # last model temp below temp
+    if idx < 0 or idx + 1 >= len(tlist):
+        raise ValueError("Temperature %s outside model grid (%s-%s)" % (temp, tlist[0], tlist[-1]))
     Tlow=tlist[idx]
     Thi =tlist[idx+1]
     return (Tlow,Thi)
@@ -1112,215 +1110,207 @@ def create_model_at_temp(model,temp):
     """Create a model spectrum for a given temperature
     """
 
-    try:
-        filein = open('Data/Stellar_Models/' + model + '.pickle','rb')
-    except:
-        raise Exception("Unrecognized model name:%s Model choice has to be [NextGen|CK04]" % model)
- 
-    tlist = pickle.load( filein, encoding='latin1')
-    filein.close()
+    tlist,gravs,waves,fluxes = read_model_grid(model)   # cached, raises if model is unknown
+    tidx = model_temp_index(model)
  
     # Check if the given temperature is already included in the model grid
-    tidx, = np.where(tlist==temp)
-    if len(tidx)==1:
-       wl,fl = read_model_spectrum(model, temp)
-       return np.rec.fromarrays((wl,fl),names="waves,fluxes")
+    if temp in tidx:
+       return Spectrum(waves=waves[tidx[temp]], fluxes=fluxes[tidx[temp]].copy())   # copy, the cached grid is read-only
     else:
        Tlow,Thi = find_enclosing_temps(temp,tlist)
-       wllow,fllow = read_model_spectrum( model, Tlow )
-       wlhi ,flhi  = read_model_spectrum( model, Thi )
-    # resample the Thi spectrum using the wllow
-    flhi = np.interp(wllow, wlhi, flhi)
-    out_flux = (flhi*(temp - Tlow) + fllow*(Thi - temp)) /(Thi - Tlow)
+       wllow,fllow = waves[tidx[Tlow]],fluxes[tidx[Tlow]]
+       flhi = fluxes[tidx[Thi]]   # same wl grid as Tlow (checked by read_model_grid)
+    # blend in place as fllow + w*(flhi - fllow), one temporary instead of four
+    out_flux = flhi - fllow
+    out_flux *= (temp - Tlow) / (Thi - Tlow)
+    out_flux += fllow
  
-    return np.rec.fromarrays((wllow,out_flux),names="waves,fluxes")
+    return Spectrum(waves=wllow, fluxes=out_flux)
 
     
-def read_model_spectrum(model,temperature):
-    """Read synthetic spectral data for a given temperature. 
-    Return the model in [micron, Jy]."""
-    tlist,models = read_all_model_spectra(model)
- 
-    tidx, = np.where(tlist==temperature)
-    if len(tidx)==0:
-        raise Exception("Non-existing model temperature %s for model %s" % (temperature, model))
-    tmodel,grav,wavelength,flux = models[tidx[0]]
- 
-    return (wavelength,flux)
-
-
-def read_all_model_spectra(model):
-        """Read all model spectra"""
-        data_file=open('Data/Stellar_Models/'  + model + '.pickle', 'rb')
-        tlist = pickle.load( data_file, encoding='latin1')
-        models= pickle.load( data_file, encoding='latin1')
-        data_file.close()
+@functools.lru_cache(maxsize=None)
+def read_model_grid(model):
+        """Read all model spectra as [temperature, wavelength] arrays
+        (read and rescaled once per model, then cached).
+        Returned arrays are read-only since they are shared by all callers.
+        Return: (tlist, gravs, waves, fluxes)"""
+        try:
+            data_file=open('Data/Stellar_Models/'  + model + '.pickle', 'rb')
+        except FileNotFoundError:
+            raise Exception("Unrecognized model name:%s Model choice has to be [NextGen|CK04]" % model)
+        with data_file:
+            tlist = pickle.load( data_file, encoding='latin1')
+            models= pickle.load( data_file, encoding='latin1')
         if model=='ck04':
            tlist = tlist[:60]
            models= models[:60]   # for some reasons, high temperature CK04 model misbehave.
+        tlist = np.asarray(tlist)
         # check the unit conversion for the scale parameter!!
-        for m in models:
-            temp,grav,wave,flux = m
-            m[-1] = (m[-1] * m[-2]**2 * (5.325E-11) / np.pi) 
-        return (tlist,models)
+        # Rescale all model fluxes in one pass (all models share the same number of wavelengths)
+        gravs = np.array([m[1] for m in models])
+        waves = np.array([m[2] for m in models])
+        if not (waves == waves[0]).all():   # Model interpolation & obs wl indexing assume one wl grid for all temps
+            raise Exception("Model %s spectra do not share one wavelength grid" % model)
+        fluxes = np.array([m[3] for m in models]) * waves**2 * (5.325E-11) / np.pi
+        for a in (tlist, gravs, waves, fluxes):
+            a.flags.writeable = False
+        return (tlist,gravs,waves,fluxes)
+
+
+@functools.lru_cache(maxsize=None)
+def model_temp_index(model):
+    """Map each model temperature to its index in read_model_grid(model)."""
+    tlist = read_model_grid(model)[0]
+    return {T: i for i, T in enumerate(tlist)}
  
 def get_model_flux_at_wavel(model,wave_obs):
     """
-    Read all model spectra by <read_all_model_spectra> and interpolate at given wavelength points.
-    Return: [temperature, wavelengths, model_flux]
+    Read all model spectra by <read_model_grid> and interpolate at given wavelength points.
+    Return: (temperatures, model_flux as [temperature, wavelength] array)
     """
-    tlist,models = read_all_model_spectra(model)
-    models_at_waveobs = []
-    for model in models:
-        temp,grav,wave,flux = model
-        mflux = np.interp(wave_obs, wave, flux)
-        models_at_waveobs.append( [temp, wave_obs, mflux] )
-    return models_at_waveobs
+    tlist,gravs,waves,fluxes = read_model_grid(model)
+    wave_obs = np.asarray(wave_obs, dtype=np.float64)
+    # Shared wl grid (checked by read_model_grid): find the interpolation weights once and apply them to all model temps (same as np.interp)
+    wave = waves[0]
+    idx = np.clip(np.searchsorted(wave, wave_obs, side='right'), 1, len(wave) - 1)
+    weight = np.clip((wave_obs - wave[idx - 1]) / (wave[idx] - wave[idx - 1]), 0, 1)
+    return tlist, fluxes[:, idx - 1] + weight * (fluxes[:, idx] - fluxes[:, idx - 1])
 
 
 # # Get Model and Create 2D Model Table
 def create_model_table():
-    # # Get Model Fluxes at observed wavelengths using SED() get_model_flux_at_wave function
-    model_fluxes = get_model_flux_at_wavel(starmodel, obs_wl)
-    mf_df = pd.DataFrame(model_fluxes)
-    mf_df_temp = mf_df.iloc[:,0]               # Get Model temps
-    mf_df_wl = mf_df.iloc[0,1]                 # Get Model wavelengths (same as observed)
-    mf_df_data = mf_df.iloc[:,2]               # Get Model flux data
-
-    # # Create 2-D Model Flux Table
-    mf_df_out = pd.DataFrame(mf_df_wl, columns=["WL"])
-    for i in range(len(mf_df_temp)):
-        mf_df_out[mf_df_temp[i]] = mf_df_data[i]
-    return mf_df_out, mf_df_temp
+    # # Get Model Fluxes at observed wavelengths as a [temp, wl] array for EMCEE model
+    model_temps, model_fluxes = get_model_flux_at_wavel(starmodel, obs_wl)
+    # float32 (FLUX_DTYPE) halves the memory read per likelihood call (lnlike still sums in float64)
+    return np.ascontiguousarray(model_fluxes, dtype=FLUX_DTYPE), np.asarray(model_temps)
 
 
 # Get Interpolated Model Flux
-# Get the linear interpolated model flux at the observed WL
-def get_mod_at_temp_wl(temp, wl_idx):
-
-    if starmodel == 'nextgen':
-        if temp < 10000:  # For temps < 10,000 K with 100 K increments
-            temp_hi = int(math.ceil(temp / 100) * 100)
-            temp_lo = temp_hi - 100
-        else:  # For temps 10,000+ K with 500K increments
-            temp_round = round(temp, -3)
-            if temp_round > temp:
-                temp_hi = temp_round
-                temp_lo = temp_hi - 500
-            else:
-                temp_lo = temp_round
-                temp_hi = temp_lo + 500
-    if starmodel == 'ck04':
-        if temp < 13000:  # For temps < 13,000 K with 250 K increments
-            temp_hi = int(math.ceil(temp / 250) * 250)
-            temp_lo = temp_hi - 250
-        else:  # For temps 13,000+ K with 1000K increments
-            temp_round = round(temp, -3)
-            if temp_round > temp:
-                temp_hi = temp_round
-                temp_lo = temp_hi - 1000
-            else:
-                temp_lo = temp_round
-                temp_hi = temp_lo + 1000
-    temp_lo_idx = mf_df_temp[mf_df_temp == temp_lo].index[0]  # Find the model index for lower temp
-    model_at_obs_flux_lo = mf_df_out.iloc[wl_idx, temp_lo_idx + 1]  # Get the model flux for lower temp
-    temp_hi_idx = mf_df_temp[mf_df_temp == temp_hi].index[0]  # Find the model index for higher temp
-    model_at_obs_flux_hi = mf_df_out.iloc[wl_idx, temp_hi_idx + 1]  # Get the model flux for higher temp
-    model_at_obs_flux_yp = pd.concat([model_at_obs_flux_lo, model_at_obs_flux_hi], axis=1,
-                                     ignore_index=True)  # y values
-    model_at_temp = []  # New list
-    for i in wl_idx:  # interpolate model flux between temps @ wl
-        model_at_temp_wl = np.interp(temp, [temp_lo, temp_hi], model_at_obs_flux_yp.loc[i])
-        if model_at_temp_wl < 0:
-            print('temp ', model_at_temp_wl, temp, temp_lo, temp_hi)
-            print('yp', model_at_obs_flux_yp.loc[i], i)
-            print('flux range', model_at_obs_flux_lo, model_at_obs_flux_hi)
-        model_at_temp.append(model_at_temp_wl)
-    return pd.Series(model_at_temp, index=wl_idx)
+# Get the linear interpolated model flux at the observed WL for an array of temps (one per walker)
+# (mf_fluxes is already interpolated at the observed WL, so its columns line up with obs_flux)
+def get_mod_at_temp_wl(temp, mf_fluxes, mf_temps):
+    # Find the model index for higher temp (clip only guards the index, lnprior keeps temps inside the grid)
+    temp_hi_idx = np.clip(np.searchsorted(mf_temps, temp), 1, len(mf_temps) - 1)
+    temp_lo_idx = temp_hi_idx - 1  # Find the model index for lower temp
+    temp_lo = mf_temps[temp_lo_idx]
+    temp_hi = mf_temps[temp_hi_idx]
+    model_at_obs_flux_lo = mf_fluxes[temp_lo_idx]  # Get the model flux for lower temp
+    # interpolate model flux between temps @ wl, reusing the higher temp gather as the output buffer
+    weight = ((temp - temp_lo) / (temp_hi - temp_lo))[:, None]
+    model_at_temp = mf_fluxes[temp_hi_idx]  # Get the model flux for higher temp (fancy indexing returns a copy)
+    model_at_temp -= model_at_obs_flux_lo
+    model_at_temp *= weight
+    model_at_temp += model_at_obs_flux_lo
+    # Count negative model fluxes here, run_sampler reports the total once per run
+    get_mod_at_temp_wl.negative_count += np.count_nonzero(model_at_temp < 0)
+    return model_at_temp
+
+
+get_mod_at_temp_wl.negative_count = 0
 
 
 # # Define Model used be EMCEE
 # Return scaled model flux value for model temp at wavelength observed
-def model(theta, wl_idx):  # wl_idx is index of model_at_obs df rows
-    temp, radius = theta
-    scale = ((radius * plx) / 1000) ** 2
-    return scale * get_mod_at_temp_wl(temp, wl_idx)
+def model(theta, mf_fluxes, mf_temps, plx_scale):
+    temp, radius = theta.T
+    scale = radius * radius * plx_scale   # same as ((radius * plx) / 1000) ** 2
+    flux_model = get_mod_at_temp_wl(temp, mf_fluxes, mf_temps)
+    flux_model *= scale[:, None]  # scale in place, get_mod_at_temp_wl returns a new array
+    return flux_model
 
 
 # # Define Log Likelihood
 # Find likelihood of model fitting observed data for all wavelengths observed using Chi-Squared functions
-def lnlike(theta, x, y, y_err):
+# theta holds one row of (temp, radius) per walker and one likelihood per walker is returned
+def lnlike(theta, y, y_var, mf_fluxes, mf_temps, plx_scale):
     # print(x)
     # if use_stored:
     #     stored = "y"
     # else:
     #     stored = "n"
     # global store_sampler_all, store_sampler, store_test, check
-    flux_model = model(theta, x)
-    sigma2 = y_err**2 + flux_model**2 * np.exp(2 * log_f)  # Variance correction from emcee example
+    flux_model = model(theta, mf_fluxes, mf_temps, plx_scale)
+    # Variance correction from emcee example (y_var = y_err**2), computed in place to avoid temporaries
+    sigma2 = flux_model * flux_model
+    sigma2 *= exp_2_log_f
+    sigma2 += y_var
     # y_err = 0.1 * y
     #ln_like = -0.5 * np.sum((y - flux_model)**2 / flux_model)  # Pearson Chi-Squared statistic (PC2)
     # ln_like = -0.5 * np.sum(((y - flux_model/y))**2 / flux_model)  # % Diff Squared (%D2)
     # ln_like = -0.5 * np.sum(((y - flux_model/y)) / flux_model)  # % Diff (%D)
     # ln_like = -0.5 * np.sum((y - flux_model)**2 / y_err)  # Chi-Squared statistic (C2)
     #ln_like = -0.5 * np.sum((y - flux_model)**2 / y_err**2)  # Chi-Squared statistic (C22)
-    ln_like = -0.5 * np.sum((y - flux_model)**2 / sigma2 + np.log(sigma2))  # Likelihood from emcee exampple
+    # Likelihood from emcee exampple: -0.5 * sum((y - flux_model)**2 / sigma2 + log(sigma2)), in place
+    chi2 = y - flux_model
+    chi2 *= chi2
+    chi2 /= sigma2
+    chi2 += np.log(sigma2, out=sigma2)
+    ln_like = -0.5 * np.sum(chi2, axis=1, dtype=np.float64)
     return ln_like
 
 
 # # Define Log Priors
 # Define limits of theta (temp & scale)
-def lnprior(theta):
-    temp, radius = theta
-    if min_model_temp < temp < max_model_temp and min_radius < radius < max_radius:  # Set temp_idx and scale ranges for sampling
-        return 0.0  # 0.0 if True
-    return -np.inf  # -inf if False
+def lnprior(theta, temp_bounds, radius_bounds):
+    temp, radius = theta.T
+    min_model_temp, max_model_temp = temp_bounds
+    min_radius, max_radius = radius_bounds
+    inside = ((min_model_temp < temp) & (temp < max_model_temp) &
+              (min_radius < radius) & (radius < max_radius))  # Set temp_idx and scale ranges for sampling
+    return np.where(inside, 0.0, -np.inf)  # 0.0 if True, -inf if False
 
 
 # # Define Log Probability
-# Define posterior probability function
-def lnprob(theta, x, y, y_err):
-    # global store_sampler_all, store_sampler
-    lp = lnprior(theta)  # check if sample vales of theta in range selected in lnprior
-    if not np.isfinite(lp):  # if not, then don't use
-        return -np.inf
-    ln_like = lnlike(theta, x, y, y_err)
-    return lp + ln_like  # if so, then use lnlike value
+# Build the posterior probability function for one sampler run, evaluated for all walkers at once (emcee vectorize=True)
+# Model table, parallax scale and prior bounds are bound here once instead of being looked up as globals on every call
+def make_lnprob(mf_fluxes, mf_temps, plx_scale, temp_bounds, radius_bounds):
+    # Keep walkers inside the model grid temps (no extrapolated model fluxes)
+    temp_bounds = (max(temp_bounds[0], mf_temps[0]), min(temp_bounds[1], mf_temps[-1]))
+    def lnprob(theta, y, y_var):
+        lp = lnprior(theta, temp_bounds, radius_bounds)  # check if sample vales of theta in range selected in lnprior
+        inside = np.isfinite(lp)  # if not, then don't use
+        if np.any(inside):
+            lp[inside] += lnlike(theta[inside], y, y_var, mf_fluxes, mf_temps, plx_scale)  # if so, then use lnlike value
+        return lp
+    return lnprob
 
 
 # # SED_EMCEE Sampler Data
 def define_data():
     # # Define EMCEE Sampling Data
     # Uses user entered data or defaults
-    data = (obs_wl_idx, obs_flux, obs_flux_err)  # data = wl index, observed flux and error
+    # Observed flux & variance as contiguous FLUX_DTYPE arrays (float32 is ample for photometry errors),
+    # squared once here instead of on every lnlike call
+    data = (np.ascontiguousarray(obs_flux, dtype=FLUX_DTYPE),
+            np.ascontiguousarray(obs_flux_err, dtype=FLUX_DTYPE)**2)  # data = observed flux and variance
     initial = np.array([Teff_bl, Rstar_bl])  # Initial values for theta (temp, scale)
 #    initial = np.array([5868, 0.0409**2])  # Initial values for theta (temp, scale)
     ndim = len(initial)  # Number of dimensions = number of theta parameters
-    p0 = [np.array(initial[0]) + np.array(initial[0] / 10) * np.random.randn(1) for i in
-            range(nwalkers)]
-    p0_2 = [np.array(initial[1]) + np.array(initial[1] / 10) * np.random.randn(1) for i in
-            range(nwalkers)]
-    p0 = np.append(p0, p0_2, axis=1)
+    # Start each walker within ~10% of the initial values, (nwalkers, ndim) array from one RNG call
+    rng = np.random.default_rng()
+    p0 = initial * (1.0 + 0.1 * rng.standard_normal((nwalkers, ndim)))
     # p0 = [np.array(initial) + 1e-5 * np.random.randn(ndim) for i in
     #       range(nwalkers)]  # p0 from another example seems to work better
     return p0, ndim, data
 
 
-# # Run sampler with multiprocessor pools
-def run_sampler(p0):
-    with closing(Pool()) as pool:
-        sampler = emcee.EnsembleSampler(nwalkers, ndim, lnprob, pool=pool, args=data,
-            moves=[
-            (emcee.moves.StretchMove(), 0),
-            (emcee.moves.KDEMove(bw_method = 1), 1),
-            (emcee.moves.DESnookerMove(), 0),
-        ])  # tried different Moves, but put back to default
-        print("Running burn-in...")
-        p0, _, _ = sampler.run_mcmc(p0, burn_in, progress=prog_flag)  # May need to adjust burn-in depending on data
-        sampler.reset()
-        print("Running production...")
-        pos, prob, state = sampler.run_mcmc(p0, niter, thin_by=thin, progress=prog_flag)
-        pool.terminate()
+# # Run sampler with all walkers evaluated in one vectorized lnprob call
+# (stars are already run in parallel by SEDmc_Batch_1.py, so no multiprocessor pool is used here)
+def run_sampler(p0, lnprob):
+    sampler = emcee.EnsembleSampler(nwalkers, ndim, lnprob, args=data, vectorize=True,
+        moves=[
+        (emcee.moves.StretchMove(), 0),
+        (emcee.moves.KDEMove(bw_method = 1), 1),
+        (emcee.moves.DESnookerMove(), 0),
+    ])  # tried different Moves, but put back to default
+    get_mod_at_temp_wl.negative_count = 0
+    print("Running burn-in...")
+    p0, _, _ = sampler.run_mcmc(p0, burn_in, progress=prog_flag)  # May need to adjust burn-in depending on data
+    sampler.reset()
+    print("Running production...")
+    pos, prob, state = sampler.run_mcmc(p0, niter, thin_by=thin, progress=prog_flag)
+    if get_mod_at_temp_wl.negative_count:
+        print('Negative model fluxes (walker x wl) during sampling = ', get_mod_at_temp_wl.negative_count)
     return sampler, pos, prob, state
 
 
@@ -1351,8 +1341,7 @@ def rad_range(Rstar_bl):
 # # # Main Routine # # #
 if __name__ == "__main__":
   # %matplotlib inline
-  fig_size = plt.rcParams['figure.figsize'] = (20, 15)  # Make plots as wide as notebook page
-  start_time = datetime.now()
+  start_time = time.perf_counter()   # Monotonic clock for the star's runtime
   
   if not os.path.exists('Data/Photometry'):
       os.makedirs('Data/Photometry/VizierSED')
@@ -1371,21 +1360,12 @@ if __name__ == "__main__":
                
   print('Prog_Flag = ',prog_flag)
   
-  # # Parse command line arguments and handle errors
-  len_arg = len(sys.argv)
-  err_str = 'Use command line args in this order-> required: Object(e.g., WASP94); ' \
-            'optional: Parallax Teff AngDia Model UseStored RA DEC'
-  
-  # # Get input parameters for SED_EMCEE by either command line arguments or prompts
-  if len_arg == 1:                           # If only name provided prompt for other input parameters
-      sname, sposition, plx_bmk, Teff_bmk, use_Teff_bmk, ang_dia_bmk, use_ang_dia_bmk, smodel, nwalkers, niter, burn_in, \
-            use_stored, star_model, position = prompt_input(err_str)
-      print(sname, sposition, plx_bmk, Teff_bmk, use_Teff_bmk, ang_dia_bmk, use_ang_dia_bmk, smodel, nwalkers, niter, burn_in,
-            use_stored)
-  else:                            # If command lime arguments provided parse for input parameters and set sampling values
-      sname, plx_bmk, Teff_bmk, ang_dia_bmk, sposition, smodel, use_ang_dia_bmk, use_Teff_bmk, \
-            use_stored, star_model, position = parse_arg(len_arg, err_str)
-      print(sname, plx_bmk, Teff_bmk, ang_dia_bmk, star_model, position, sposition, smodel, use_stored, nwalkers, niter, burn_in)
+  # # Get input parameters for SED_EMCEE from command line arguments
+  params = StarParams.from_argv()
+  print(params)
+  sname, plx_bmk, Teff_bmk, ang_dia_bmk = params.sname, params.plx, params.Teff_bmk, params.ang_dia
+  use_stored, position = params.use_stored, params.position
+  nwalkers, niter, burn_in = params.nwalkers, params.niter, params.burn_in
   
   # Convert stored data flag to text
   if use_stored:
@@ -1394,15 +1374,12 @@ if __name__ == "__main__":
       stored = "New"
   
   ## Define Star Model
-  if not smodel:
-      star_model = starmodel = 'ck04'
-  else:
-      starmodel = star_model
+  star_model = starmodel = params.starmodel
   print(starmodel)
   
   
   ## Create tables to store all input parameters and results
-  store_all = pd.DataFrame({'Source':sname}, index=[0])
+  store_all = {'Source': sname}
   
   ## Create tables to store all samplers data and results
   store_sampler_all = pd.DataFrame([])
@@ -1410,14 +1387,17 @@ if __name__ == "__main__":
   store_test = pd.DataFrame()
   check = 0
   
-  # Capture all paralax data to chose one with lowest uncertainty
-  plx_data = pd.DataFrame(columns = ['Plx', 'Plx_err', 'Plx_pre'])
-  
   ## Fit Star using source name
   source_name = sname
   
+  # Start the VizierSED photometry query in the background while Simbad & GAIA are queried
+  sed_executor = ThreadPoolExecutor(max_workers=1)
+  sed_query = sed_executor.submit(query_sed, source_name, use_stored=use_stored)
+
   src_ID_2 = "NaN"
-  RA, DEC, plx, plx_err  = get_VO_Data(source_name)
+  # Capture all paralax data (plx_data) to chose one with lowest uncertainty
+  RA, DEC, plx, plx_err, vo_data, plx_data = get_VO_Data(source_name)
+  store_all.update(vo_data)
   
   # Load Benchmark Data for source if available
   use_Teff_bmk = False  # Force use of bennchmark file
@@ -1436,8 +1416,8 @@ if __name__ == "__main__":
       plx_bmk = "NaN"
       plx_bmk_err = "NaN"
       if src_ID_2 != "Nan":
-          Teff_bl = store_all['TEFF_dr2'][0]   # Use GAIA DR2 Teff as baseline Temp
-          Rstar_bl = store_all['RSTAR_dr2'][0]  # Use GAIA DR2 Rstar as baseline stellar radius
+          Teff_bl = store_all['TEFF_dr2']   # Use GAIA DR2 Teff as baseline Temp
+          Rstar_bl = store_all['RSTAR_dr2']  # Use GAIA DR2 Rstar as baseline stellar radius
       # ang_dia_bmk = s.sfit_apprad * 4.65047 * 2    # Use SEDFit apprad
       apprad_bl = (Rstar_bl * plx) / 1000
       print('Teff & apprad not defined')
@@ -1475,7 +1455,7 @@ if __name__ == "__main__":
   store_all['plx_bl'] = plx_bl
   store_all['plx_bl_err'] = plx_bl_err
   if isinstance(plx_bl, float): 
-      plx_data.loc['Baseline'] = [plx_bl, plx_bl_err, plx_bl_err / plx_bl]
+      plx_data['Baseline'] = (plx_bl, plx_bl_err, plx_bl_err / plx_bl)
   
   min_radius, max_radius = rad_range(Rstar_bl) ##  Set Likelihood radius range
   
@@ -1489,8 +1469,8 @@ if __name__ == "__main__":
   fit_err_init = 0.1
   fit_pts_min = 12
   
-  plx_idx = plx_data[['Plx_pre']].idxmin()[0]  # Get index of best parallax
-  plx_mc, plx_mc_err, plx_mc_pre = plx_data.loc[plx_idx]   #Get best parallax for SEDmc input
+  plx_idx = min((k for k in plx_data if not np.isnan(plx_data[k][2])), key=lambda k: plx_data[k][2])  # Get best parallax
+  plx_mc, plx_mc_err, plx_mc_pre = plx_data[plx_idx]   #Get best parallax for SEDmc input
   print("Best Parallax", plx_idx, plx_mc, plx_mc_err, plx_mc_pre)
   
   # Store SED_EMCEE input parameters
@@ -1499,32 +1479,41 @@ if __name__ == "__main__":
   store_all['Burn In'] = burn_in
   store_all['Best Plx'] = plx_idx
   store_all['Parallax'] = plx = plx_mc
+  plx_scale = (plx / 1000) ** 2   # Model flux scale per Rstar**2, fixed for the whole run (used by model)
   store_all['Parallax_err'] = plx_err = plx_mc_err
   
   
-  # # Use query_sed to get Photometry data
-  obs_data_range, viz_err = query_sed(source_name)
+  # # Use query_sed to get Photometry data (started above, wait for it here)
+  obs_data_range, viz_err = sed_query.result()
+  sed_executor.shutdown()
   print('Done VizierSED Error = ', viz_err)
   obs_data = obs_data_range
   obs_data = remove_dups(obs_data)
   if len(obs_data) < fit_pts_min:
       fit_pts_min = len(obs_data)
   print('Observed Data Points = ', len(obs_data))
+  obs_fl = obs_data['fl'].to_numpy()
+  obs_ylim = (0.3*np.abs(obs_fl).min(), 7.0*obs_fl.max())   # Y limits for observed data plots
   
   
   # Run both models
-  save_acc = pd.DataFrame(columns = ['Teff', 'Radius'])  #Capture %Delta bl/Bl data
-  save_err = pd.DataFrame(columns = ['Teff', 'Radius'])  #Capture error data
-  save_store_all = pd.DataFrame([])
   model_lst = ['ck04','nextgen']
-  for starmodel in model_lst:
+  save_acc = np.empty((len(model_lst), 2))  #Capture %Delta bl/Bl data (Teff, Radius) for each model
+  save_err = np.empty((len(model_lst), 2))  #Capture error data (Teff, Radius) for each model
+  per_model_results = {}   # store_all data for each model fitted
+  for midx, starmodel in enumerate(model_lst):
       low_acc = False  # reset low_acc flag for new model
       print('Start Model & Accuracy', starmodel, low_acc)
       if starmodel == 'ck04' and Teff_bl <= 3600:   ## Don't use CK04 if temp < 3600
-          save_acc.loc[starmodel] = [99.99, 99.99]
-          save_err.loc[starmodel] = [99.99, 99.99]
+          save_acc[midx] = (99.99, 99.99)
+          save_err[midx] = (99.99, 99.99)
           print('CK04 skipped')
           continue
+      if starmodel == 'nextgen' and Teff_bl > read_model_grid('nextgen')[0][-1]:   ## Don't use NextGen above its highest model temp
+          save_acc[midx] = (99.99, 99.99)
+          save_err[midx] = (99.99, 99.99)
+          print('NextGen skipped')
+          continue
       print(starmodel)
   
       min_model_temp, max_model_temp = temp_range(Teff_bl, starmodel) # Set temp range for likelihood function
@@ -1534,37 +1523,39 @@ if __name__ == "__main__":
       apprad_bl = (Rstar_bl * plx_bl) / 1000
       bl_star.fluxes *= apprad_bl**2    # Multiply fluxes by scale factor (apprad**2)
       print("Baseline, Teff, Rstar & AppRad = ", baseline, Teff_bl, Rstar_bl, apprad_bl)
+      # All model temps share one wl grid, so find the nearest grid wl for each obs wl once per model
+      obs_grid_idx = nearest_wave_idx(bl_star.waves, obs_data['wl'].to_numpy())
       # # FIRST ITERATION # #
       # Perform first iteration using SED best fit curve for filtering observed data #
       itr = 1
       
       if use_stored:  # Use stored observed data for fit curve
-          good_data, bad_data, fit_pts, fit_err, fit_qual, bad_cnt = get_stored_data(fit_err_init, fit_pts_min)
+          good_data, bad_data, fit_pts, fit_err, fit_qual, bad_cnt = get_stored_data(sname, starmodel, fit_err_init, fit_pts_min)
       else:  # Get observed data for fit curve
           # # Original clean data filtering method
           # good_data, bad_data, bad_data_keep, fit_pts, fit_err, fit_qual, fit_qual2 = get_clean_data(obs_data_range, bl_star, fit_err_init, fit_pts_min)
           # # Updated clean data filtering method
           print("clean data")
-          good_data, bad_data, fit_pts, fit_err, fit_qual = get_clean_data(obs_data, bl_star, fit_err_init, fit_pts_min)
+          good_data, bad_data, fit_pts, fit_err, fit_qual = get_clean_data(obs_data, bl_star, fit_err_init, fit_pts_min, obs_grid_idx)
           # # Vizier SED data filtering based on blackbody curve fitting method
           if fit_err > .5:  # Check if low accuracy
               low_acc = True
               print('Low Accuracy - Fit Err = ', fit_err)
-              if isinstance(store_all['RSTAR_dr2'][0], float) and not np.isnan(store_all['RSTAR_dr2'][0]):
+              if isinstance(store_all['RSTAR_dr2'], float) and not np.isnan(store_all['RSTAR_dr2']):
                   # Check if DR2 data available 
-                  Teff_bl = int(store_all['TEFF_dr2'][0])
-                  Teff_bl_err = int(store_all['TEFF_POS_dr2'][0]) - Teff_bl
-                  Rstar_bl = float('{:.3g}'.format(store_all['RSTAR_dr2'][0]))
-                  Rstar_bl_err = float('{:.3g}'.format(abs(store_all['RSTAR_POS_dr2'][0] - Rstar_bl)))
-                  plx_bl = float('{:.3g}'.format(store_all['PLX_dr2'][0]))
-                  plx_bl_err = float('{:.3g}'.format(store_all['PLX_ERR_dr2'][0]))
+                  Teff_bl = int(store_all['TEFF_dr2'])
+                  Teff_bl_err = int(store_all['TEFF_POS_dr2']) - Teff_bl
+                  Rstar_bl = float('{:.3g}'.format(store_all['RSTAR_dr2']))
+                  Rstar_bl_err = float('{:.3g}'.format(abs(store_all['RSTAR_POS_dr2'] - Rstar_bl)))
+                  plx_bl = float('{:.3g}'.format(store_all['PLX_dr2']))
+                  plx_bl_err = float('{:.3g}'.format(store_all['PLX_ERR_dr2']))
                   bl_star = create_model_at_temp(starmodel, Teff_bl) # interpolate between model temps above and below
                   ang_dia_bl = store_all['ang_dia_bl'] = float('{:.3g}'.format(4.65047 * 2 / 1000 * Rstar_bl * plx_bl))
                   ang_dia_bl_err = store_all['ang_dia_bl_err'] = float('{:.2g}'.format(4.65047 * 2 /1000 * np.sqrt((Rstar_bl * plx_bl_err)**2 + (plx_bl * Rstar_bl_err)**2)))
                   apprad_bl = (Rstar_bl * plx_bl) / 1000
                   bl_star.fluxes *= apprad_bl**2    # Multiply fluxes by scale factor (apprad**2)
                   print("DR2 Teff, Rstar & AppRad = ", Teff_bl, Rstar_bl, apprad_bl)
-                  good_data, bad_data, fit_pts, fit_err, fit_qual = get_clean_data(obs_data, bl_star, fit_err_init, fit_pts_min)
+                  good_data, bad_data, fit_pts, fit_err, fit_qual = get_clean_data(obs_data, bl_star, fit_err_init, fit_pts_min, obs_grid_idx)
                   min_radius, max_radius = rad_range(Rstar_bl)
                   min_model_temp, max_model_temp = temp_range(Teff_bl, starmodel)
                   store_all['Teff_bl'] = Teff_bl
@@ -1579,11 +1570,8 @@ if __name__ == "__main__":
                   print('DR2 data not available')
   
               
-          good_data = good_data.reset_index(drop=True)
-          wl_min = float('{:.3g}'.format(np.min(good_data.wl)))
+          wl_min = float('{:.3g}'.format(np.min(good_data.wl)))   # get_clean_data tables are already numbered from 0
           wl_max = float('{:.3g}'.format(np.max(good_data.wl)))
-          bad_data_idx = bad_data.index
-          bad_data = bad_data.reset_index(drop=True)
           bad_cnt = len(bad_data)
       
       # Separate plotting data
@@ -1593,36 +1581,34 @@ if __name__ == "__main__":
       by = bad_data.fl
       
       # Clean up flux error
-      good_data.efl = good_data.efl.replace(np.nan, 0)   # replace NaN with 0
-      good_data['efl'] = np.where(good_data['efl'] == 0, good_data['fl'] * 0.1, good_data['efl'])   # replace 0 w/ 10% flux
+      good_data = fill_flux_err(good_data)   # replace NaN or 0 w/ 10% flux
       
       # Separate into column lists
       obs_wl = good_data.wl  # Use SED wl range and clean data
-      obs_flux = good_data.fl  # Use SED observed flux @ wl range and clean data from inphot
-      obs_flux_err = good_data.efl  # Use SED observed flux error @ wl range and clean data from inphot
-      obs_wl_idx = list(range(0, len(obs_wl)))  # Update wl index list for EMCEE model for wl range and clean data
+      obs_flux = good_data.fl.to_numpy()  # Use SED observed flux @ wl range and clean data from inphot
+      obs_flux_err = good_data.efl.to_numpy()  # Use SED observed flux error @ wl range and clean data from inphot
       
       
       # # Get Model and Create 2D Model Table
-      mf_df_out, mf_df_temp = create_model_table()
+      mf_fluxes, mf_temps = create_model_table()
       
       # # SED_EMCEE Sampler Data
       p0, ndim, data = define_data()
       
       # Run Sampler
       print('Model, Baseline, Teff_bl, Rsun_bl, ang_dia_bl, fit_err', starmodel, baseline, Teff_bl, Rstar_bl, ang_dia_bl, fit_err)
-      sampler, pos, prob, state = run_sampler(p0)
+      lnprob = make_lnprob(mf_fluxes, mf_temps, plx_scale, (min_model_temp, max_model_temp), (min_radius, max_radius))
+      sampler, pos, prob, state = run_sampler(p0, lnprob)
+      samples = sampler.get_chain(flat=True)  # Flat chain, copied out of the sampler once per run
       
       #Reset Baseline data and run again if accuracy too low
       loop_cnt = 0
       while low_acc == True:
           loop_cnt += 1
           print('Loop Count =', loop_cnt)
-          samples = sampler.flatchain
-          temps = np.percentile(samples[:, 0], [16, 50, 84])
+          temps, radii = np.percentile(samples, [16, 50, 84], axis=0).T   # Both parameters in one call
           Teff_bl = int(temps[0])
           Teff_bl_err = int(np.diff(temps)[0])
-          radii = np.percentile(samples[:, 1], [16, 50, 84])
           Rstar_bl = float('{:.3g}'.format(radii[0]))
           Rstar_bl_err = float('{:.3g}'.format(np.diff(radii)[0]))
           plx_bl = plx_mc
@@ -1633,7 +1619,7 @@ if __name__ == "__main__":
           apprad_bl = (Rstar_bl * plx_bl) / 1000
           bl_star.fluxes *= apprad_bl**2    # Multiply fluxes by scale factor (apprad**2)
           print("SEDmc Teff, Rstar, AngDia & AppRad = ", Teff_bl, Rstar_bl, ang_dia_bl, apprad_bl)
-          good_data, bad_data, fit_pts, fit_err, fit_qual = get_clean_data(obs_data, bl_star, fit_err_init, fit_pts_min)
+          good_data, bad_data, fit_pts, fit_err, fit_qual = get_clean_data(obs_data, bl_star, fit_err_init, fit_pts_min, obs_grid_idx)
           min_radius, max_radius = rad_range(Rstar_bl)
           min_model_temp, max_model_temp = temp_range(Teff_bl, starmodel)
           store_all['Teff_bl'] = Teff_bl
@@ -1643,11 +1629,8 @@ if __name__ == "__main__":
           baseline = 'Initial SEDmc Results'
           
           #Clean up Good Data
-          good_data = good_data.reset_index(drop=True)
-          wl_min = float('{:.3g}'.format(np.min(good_data.wl)))
+          wl_min = float('{:.3g}'.format(np.min(good_data.wl)))   # get_clean_data tables are already numbered from 0
           wl_max = float('{:.3g}'.format(np.max(good_data.wl)))
-          bad_data_idx = bad_data.index
-          bad_data = bad_data.reset_index(drop=True)
           bad_cnt = len(bad_data)
       
           # Separate plotting data
@@ -1657,27 +1640,26 @@ if __name__ == "__main__":
           by = bad_data.fl
       
           # Clean up flux error
-          good_data.efl = good_data.efl.replace(np.nan, 0)   # replace NaN with 0
-          good_data['efl'] = np.where(good_data['efl'] == 0, good_data['fl'] * 0.1, good_data['efl'])   # replace 0 w/ 10% flux
+          good_data = fill_flux_err(good_data)   # replace NaN or 0 w/ 10% flux
           
           # Separate into column lists
           obs_wl = good_data.wl  # Use SED wl range and clean data
-          obs_flux = good_data.fl  # Use SED observed flux @ wl range and clean data from inphot
-          obs_flux_err = good_data.efl  # Use SED observed flux error @ wl range and clean data from inphot
-          obs_wl_idx = list(range(0, len(obs_wl)))  # Update wl index list for EMCEE model for wl range and clean data
+          obs_flux = good_data.fl.to_numpy()  # Use SED observed flux @ wl range and clean data from inphot
+          obs_flux_err = good_data.efl.to_numpy()  # Use SED observed flux error @ wl range and clean data from inphot
                   
           # # Get Model and Create 2D Model Table
-          mf_df_out, mf_df_temp = create_model_table()
+          mf_fluxes, mf_temps = create_model_table()
           
           # # SED_EMCEE Sampler Data
           p0, ndim, data = define_data()
           
           # Run Sampler
           print('Model, Baseline, Teff_bl, Rsun_bl, ang_dia_bl, fit_err', starmodel, baseline, Teff_bl, Rstar_bl, ang_dia_bl, fit_err)
-          sampler, pos, prob, state = run_sampler(p0)
+          lnprob = make_lnprob(mf_fluxes, mf_temps, plx_scale, (min_model_temp, max_model_temp), (min_radius, max_radius))
+          sampler, pos, prob, state = run_sampler(p0, lnprob)
           
           # Check Accuracy and Update flag
-          samples = sampler.flatchain
+          samples = sampler.get_chain(flat=True)  # Flat chain, copied out of the sampler once per run
           radii = np.percentile(samples[:, 1], [16, 50, 84])
           Rstar_ck = float('{:.3g}'.format(radii[0]))
           Rstar_ck_acc = abs((Rstar_ck - Rstar_bl) / Rstar_bl)
@@ -1693,24 +1675,24 @@ if __name__ == "__main__":
               print('Low Accuracy Check', low_acc, fit_err, Rstar_ck_acc)
       
       # Plot Sampler Behavior
-      plot_chain(itr)
+      chain_png = plot_chain(itr)
       
       # Get samples, max values of parameter space & AutoCorrelation times
-      samples = sampler.flatchain  # Per example
-      theta_max = samples[np.argmax(sampler.flatlnprobability)]  # Per example
+      mcmc_pct = np.quantile(samples.astype(np.float32), [0.16, 0.5, 0.84], axis=0).T   # 16/50/84 percentiles of each parameter, shared by plots
+      theta_max = samples[np.argmax(sampler.get_log_prob(flat=True))]  # Per example (samples is the flat chain of the last run)
       tau = sampler.get_autocorr_time(quiet=True)
       
       # Calculate Uncertainties & Plot
       teff_med, teff_u_neg, teff_u_plus, teff_med_pct_bl, scale_med, scale_u_neg, scale_u_plus, apprad_med, \
       apprad_u_neg, apprad_u_plus, ang_dia_emc, ang_dia_emc_u_neg, ang_dia_emc_u_plus, ang_dia_emc_pct_bl, \
-      Rstar_med, Rstar_u_neg, Rstar_u_plus, Rstar_bl, Rstar_pct_bl, ang_dia_emc_pct_u, teff_pct_u, Rstar_pct_u = plot_sigmas(itr)
+      Rstar_med, Rstar_u_neg, Rstar_u_plus, Rstar_bl, Rstar_pct_bl, ang_dia_emc_pct_u, teff_pct_u, Rstar_pct_u, sigma_png = plot_sigmas(itr, mcmc_pct)
       
       # Get SED_EMCEE Best Fit curve
       fit_star = create_model_at_temp(starmodel, theta_max[0]) # interpolate between model temps above and below
       fit_star.fluxes *= scale_med  # Multiply fluxes by scale factor (apprad**2)
       
       # # Corner Plot
-      labels = plot_corner(itr)
+      labels, corner_png = plot_corner(itr, mcmc_pct, tau)
       
       # # Print Best Fit Value Summary
       print_summary(plx_mc, plx_mc_err)
@@ -1721,6 +1703,7 @@ if __name__ == "__main__":
       store_all['Baseln'] = baseline
       Tau_Teff = store_all['Tau_Teff'] = round(tau[0], 3)
       Tau_Radius = store_all['Tau_Radius'] = round(tau[1], 3)
+      store_all['Acceptance'] = round(np.mean(sampler.acceptance_fraction), 3)
       store_all['Stored'] = stored
       store_all['Model'] = starmodel
       store_all['Name'] = source_name
@@ -1731,10 +1714,10 @@ if __name__ == "__main__":
       store_all['%Rsn_err+'] = Rstar_u_plus / Rstar_med
       
       # Plot SED_EMCEE Best Fit curve and Observed Data
-      plot_SED_EMCEE_obs(gx, gy, bx, by, itr)
+      fit_png = plot_SED_EMCEE_obs(gx, gy, bx, by, itr, fit_star, bl_star, obs_ylim)
       
       # Plot Observed Data Table
-      plot_obs_table(itr)
+      table_png = plot_obs_table(itr, source_name, good_data, bad_data)
       
       # Round parallax and error for report
       plx_rpt = float('{:.4g}'.format(plx_mc))
@@ -1756,13 +1739,11 @@ if __name__ == "__main__":
                str(Rstar_med) + " (+" + str(Rstar_u_plus) + ', -' + str(Rstar_u_neg) + ')' + '  {' + str(Rstar_pct_u) + '%}',
                str(ang_dia_emc) + " (+" + str(ang_dia_emc_u_plus) + ', -' + str(ang_dia_emc_u_neg) + ')' + '  {' + str(ang_dia_emc_pct_u) + '%}', ], 
       ]
-      pdf = FPDF()
       if position == (0,0):
           position = (RA,DEC)
-      pdf_header()
       
-      # Add Plots to PDF Report ##
-      pdf_plots(itr)
+      # Collect plots for PDF Report (the PDF is built once, after any data point edits) ##
+      pdf_pages = [(fit_png, sigma_png, table_png, chain_png, corner_png)]
       
       
       # # Edit Observed Data Point # #
@@ -1772,11 +1753,11 @@ if __name__ == "__main__":
           print('Would you like to edit points (y = yes)? ')
           edit_pts = sys.stdin.readline()
           if edit_pts == "y\n":
-              plot_obs(itr, obs_data, gx, gy, bx, by)
-              plot_obs_table(itr)
-              # Reading and show png image file for XTerm sessions
-              im1 = Image.open('Data/Figures/' + source_name + '_Observed_' + str(itr) + '.png')
-              im2 = Image.open('Data/Figures/' + source_name + '_Observed_Table' + str(itr) + '.png')
+              obs_png = plot_obs(itr, source_name, obs_ylim, good_data, bad_data, fit_star, bl_star, theta_max, Teff_bmk, ang_dia_bmk)
+              table_png = plot_obs_table(itr, source_name, good_data, bad_data)
+              # Show in-memory png images for XTerm sessions
+              im1 = Image.open(obs_png)
+              im2 = Image.open(table_png)
               # show images
               im1.show()
               im2.show()
@@ -1838,74 +1819,89 @@ if __name__ == "__main__":
       
               # Separate into column lists
               obs_wl = good_data.wl  # Use SED wl range and clean data
-              obs_flux = good_data.fl  # Use SED observed flux @ wl range and clean data from inphot
-              obs_flux_err = good_data.efl  # Use SED observed flux error @ wl range and clean data from inphot
-              obs_wl_idx = list(range(0, len(obs_wl)))  # Update wl index list for EMCEE model for wl range and clean data
+              obs_flux = good_data.fl.to_numpy()  # Use SED observed flux @ wl range and clean data from inphot
+              obs_flux_err = good_data.efl.to_numpy()  # Use SED observed flux error @ wl range and clean data from inphot
       
               # Plot SEDfit best fit curve and observed data
               # plot_SEDfit_obs(gx, gy, bx, by)
       
               # # Get Model and Create 2D Model Table
-              mf_df_out, mf_df_temp = create_model_table()
+              mf_fluxes, mf_temps = create_model_table()
       
               # # SED_EMCEE Sampler Data
               p0, ndim, data = define_data()
       
               # Run Sampler
-              sampler, pos, prob, state = run_sampler(p0)                
+              lnprob = make_lnprob(mf_fluxes, mf_temps, plx_scale, (min_model_temp, max_model_temp), (min_radius, max_radius))
+              sampler, pos, prob, state = run_sampler(p0, lnprob)
       
               # Plot Sampler Behavior
-              plot_chain(itr)
+              chain_png = plot_chain(itr)
       
               # # Print Best Fit Value Summary
               samples, theta_max, Rstar, plx, tau = print_summary(plx)
+              mcmc_pct = np.quantile(samples.astype(np.float32), [0.16, 0.5, 0.84], axis=0).T   # 16/50/84 percentiles of each parameter, shared by plots
       
               # Get SED_EMCEE Best Fit curve
               fit_star = create_model_at_temp(starmodel, theta_max[0]) # interpolate between model temps above and below
               fit_star.fluxes *= theta_max[1] # Multiply fluxes by scale factor (apprad**2)
       
               # # Corner Plot
-              labels = plot_corner(itr)
+              labels, corner_png = plot_corner(itr, mcmc_pct, tau)
       
               # Calculate Uncertainties & Plot
               teff_med, teff_u_neg, teff_u_plus, teff_med_pct_bl, scale_med, scale_u_neg, scale_u_plus, \
               apprad_med, apprad_u_neg, apprad_u_plus, ang_dia_emc, ang_dia_emc_u_neg, ang_dia_emc_u_plus, \
-              ang_dia_emc_pct_bl, Rstar_med, Rstar_u_neg, Rstar_u_plus = plot_sigmas(itr)
+              ang_dia_emc_pct_bl, Rstar_med, Rstar_u_neg, Rstar_u_plus, sigma_png = plot_sigmas(itr, mcmc_pct)
       
               # Plot SED_EMCEE Best Fit curve and Observed Data
-              plot_SED_EMCEE_obs(gx, gy, bx, by, itr)
+              fit_png = plot_SED_EMCEE_obs(gx, gy, bx, by, itr, fit_star, bl_star, obs_ylim)
       
               # Add Plots to PDF Report ##
-              pdf.add_page()
-              pdf_plots(itr)
+              pdf_pages.append((fit_png, sigma_png, table_png, chain_png, corner_png))
           else:
               loop = False
       
       
-      # Save PDF
+      # Build & Save PDF, one page of plots per iteration
+      pdf = FPDF()
+      pdf_header()
+      for page, page_pngs in enumerate(pdf_pages):
+          if page:
+              pdf.add_page()
+          pdf_plots(*page_pngs)
       pdf.output('Data/Reports/' + starmodel + '/' + sname + '-' + stored + '.pdf')
       
       # Save Store all data for current model
-      save_store_all = save_store_all.append(store_all)
+      per_model_results[starmodel] = dict(store_all)   # copy, store_all is updated again by the next model
       
-      # Store Photometry Data
-      good_data.to_csv('Data/Photometry/' + star_model + '/' + sname + '_good_data.csv', index=False)
-      bad_data.to_csv('Data/Photometry/' + star_model + '/' + sname + '_bad_data.csv', index=False)
+      # Store Photometry Data (stored runs only read the fit columns, so leave the stored files as they are)
+      if not use_stored:
+          good_data.to_csv('Data/Photometry/' + star_model + '/' + sname + '_good_data.csv', index=False)
+          bad_data.to_csv('Data/Photometry/' + star_model + '/' + sname + '_bad_data.csv', index=False)
       
       # Save accuracy & precision data
-      save_acc.loc[starmodel] = [abs(teff_med_pct_bl), abs(Rstar_pct_bl)]  # Accuracy data
-      save_err.loc[starmodel] = [abs(teff_pct_u), abs(Rstar_pct_u)]          # Precision data
+      save_acc[midx] = (abs(teff_med_pct_bl), abs(Rstar_pct_bl))  # Accuracy data
+      save_err[midx] = (abs(teff_pct_u), abs(Rstar_pct_u))          # Precision data
+  
+  save_acc = pd.DataFrame(save_acc, index=model_lst, columns=['Teff', 'Radius'])
+  save_err = pd.DataFrame(save_err, index=model_lst, columns=['Teff', 'Radius'])
   
   # Choose most accurate and precise model results
-  #starmodel = save_acc[['Teff']].idxmin()[0]   # Use for highest accuracy model
-  starmodel = save_err[['Radius']].idxmin()[0]   # Use for highest precision model
+  #starmodel = save_acc['Teff'].idxmin()   # Use for highest accuracy model
+  fitted_err = save_err.loc[list(per_model_results), 'Radius']   # Only models that were fitted (skipped ones hold 99.99)
+  if fitted_err.isna().all():
+      print('No fitted model with a Radius error, best model data not saved')
+      sys.exit(1)   # Nonzero exit so the batch run leaves this star out
+  starmodel = fitted_err.idxmin()   # Use for highest precision model
   print('Best model =', starmodel)
   
-  runtime = datetime.now() - start_time
+  runtime = timedelta(seconds=time.perf_counter() - start_time)   # Same Runtime format as before
   print('Runtime = ', runtime)
   
   # Store all data
   #store_all = input_para = pd.read_csv('store_all_' + starmodel +'.csv')
-  store_all = save_store_all.loc[save_store_all['Model'] == starmodel]
+  # Columns come from store_all, which holds the keys set for every model fitted (same columns as a table of all models)
+  store_all = pd.DataFrame([per_model_results[starmodel]], columns=list(store_all))
   store_all['Runtime'] = runtime
   store_all.to_csv('Data/Run_Data/' + sname +'_store_best.csv', index=False)
@@ -1,46 +1,127 @@
 ##  SEDmc batch file for all stars ##
 ##  Run from OS in Radius_Valley directory using "python SEDmc/SEDmc_Batch_1.py" command
-##  Ensure prog_flag = False in SEDmc spript to keep it from filling up log file 
-##  Create additional batch Python scripts (e.g., SEDmc_Batch_2.py) with associated directories to run conncurrent batch processes using tmux, etc.
+##  Ensure prog_flag = False in SEDmc spript to keep it from filling up log file
+##  Stars are fit concurrently (up to n_proc stars at a time, each in its own process), so the batch input file no longer
+##  needs to be split into additional batch Python scripts (e.g., SEDmc_Batch_2.py) run concurrently using tmux, etc.
+##  Results are appended to the batch output file in input file order. Stars that fail are left out (see Data/Logs).
 
 import os
+# Same thread defaults as SEDmc.py, set before numpy is first imported (star processes inherit it)
+for thread_var in ('OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'OMP_NUM_THREADS'):
+    os.environ.setdefault(thread_var, '1')
+import sys
+import time
+import runpy
 import pandas as pd
-from datetime import datetime
-import subprocess
-
-# Create Logs directory to capture all output messages
-if not os.path.exists('Data/Logs'):
-    os.makedirs('Data/Logs')
-print(os.getcwd())
-start_time = datetime.now()    # Capture start time
-print('Start Time = ', start_time)
-
-#  Input command line parameter CSV file
-#  Example batch input file record: TIC100990000,15.8999	6169,0.1656,ck04,n,54.819538,-42.7630276
-
-input_para = pd.read_csv('Data/Batch/Batch_1/Batch_1_IN_RV_1-1923.csv')  # Read batch input file
-
-## Run SEDmc for each star in batch input file
-store_bmrk = pd.DataFrame([])
-for i in range(len(input_para)):  
-    job_start = datetime.now()
-    print(i+1, input_para.iloc[i,0], job_start)   # Show star number, name and start time
-    out_log = open("Data/Logs/" + input_para.iloc[i,0] + ".txt", "w")   # Start logging output
-    print('python SEDmc/SEDmc.py ' + input_para.iloc[i,0] + ' ' + str(input_para.iloc[i,1]) + ' ' +
-              str(input_para.iloc[i,2]) + ' ' + str(input_para.iloc[i,3]) + ' ' + input_para.iloc[i,4] + ' ' +
-              input_para.iloc[i,5] + ' ' + str(input_para.iloc[i,6]) + ' ' + str(input_para.iloc[i,7]))         #Show command being run
-    out = subprocess.run(['python','SEDmc/SEDmc.py',input_para.iloc[i,0],str(input_para.iloc[i,1]),
-              str(input_para.iloc[i,2]),str(input_para.iloc[i,3]),input_para.iloc[i,4],
-              input_para.iloc[i,5],str(input_para.iloc[i,6]),str(input_para.iloc[i,7])], capture_output=True, text=True)   # Run command
-    out_log.write(out.stdout)
-    out_log.write(out.stderr)
-    out_log.close()
-    store_all = pd.read_csv('Data/Run_Data/' + input_para.iloc[i,0] +'_store_best.csv')     # Save all data for current star
-    store_bmrk = store_bmrk.append(store_all)    # Add data for current star to batch output file and save
-    store_bmrk.to_csv('Data/Batch/Batch_1/Batch_1_OUT_RV_1-1923.csv', index=False)
-    jobtime = datetime.now() - job_start
-    print('Jobtime = ', jobtime)  # Show runtime for each star
-
-# Show runtime for all stars in batch file input
-runtime = datetime.now() - start_time
-print('Runtime = ', runtime)
+from datetime import datetime, timedelta
+from multiprocessing import Process
+from multiprocessing.connection import wait
+
+#  Batch input & output files
+in_file = 'Data/Batch/Batch_1/Batch_1_IN_RV_1-1923.csv'
+out_file = 'Data/Batch/Batch_1/Batch_1_OUT_RV_1-1923.csv'
+n_proc = os.cpu_count()    # Number of stars fit at the same time
+
+
+## Import SEDmc's packages once in the batch process
+# Star processes are forked from it, so they start with numpy, emcee, astropy, etc. already imported
+def preload_sedmc():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot, emcee, corner, fpdf, astropy.table, astroquery.simbad, astroquery.gaia
+
+
+## Run SEDmc for one star (in its own process, started by start_star)
+# SEDmc.py is run as __main__ with the same arguments as "python SEDmc/SEDmc.py ...", all output goes to the star's log
+def run_star(cmd, log_file):
+    with open(log_file, "w") as out_log:   # Save logging output
+        os.dup2(out_log.fileno(), sys.stdout.fileno())
+        os.dup2(out_log.fileno(), sys.stderr.fileno())
+    sys.argv = cmd
+    runpy.run_path(cmd[0], run_name='__main__')   # Errors are logged and give a nonzero exit code
+
+
+## Start SEDmc for one star in batch input file
+def start_star(i, star):
+    print(i+1, star[0], datetime.now())   # Show star number, name and start time
+    cmd = ['SEDmc/SEDmc.py', star[0], str(star[1]), str(star[2]), str(star[3]), star[4], star[5],
+           str(star[6]), str(star[7])]
+    print('python', ' '.join(cmd))         #Show command being run
+    proc = Process(target=run_star, args=(cmd, "Data/Logs/" + star[0] + ".txt"))
+    proc.start()
+    return proc, star, time.perf_counter()
+
+
+## Collect data for one finished star (None if SEDmc failed, see the star's log)
+def finish_star(i, proc, star, job_start):
+    proc.join()
+    jobtime = timedelta(seconds=time.perf_counter() - job_start)
+    print(i+1, star[0], 'Jobtime = ', jobtime)  # Show runtime for each star
+    if proc.exitcode != 0:
+        print(i+1, star[0], 'SEDmc failed, exit code =', proc.exitcode)
+        return None
+    return pd.read_csv('Data/Run_Data/' + star[0] +'_store_best.csv')     # Save all data for current star
+
+
+## Append one star's data to the batch output file, lining its columns up by name with out_cols
+# (stars only get some columns, e.g. GAIA release data, so a star with new columns widens the file once)
+def append_star(store_all, out_cols):
+    if out_cols is None:   # First star, write header
+        store_all.to_csv(out_file, index=False)
+        return list(store_all.columns)
+    new_cols = [c for c in store_all.columns if c not in out_cols]
+    if new_cols:
+        out_cols = out_cols + new_cols
+        # Rewrite previous stars with the new (empty) columns, keeping their saved text as is
+        saved = pd.read_csv(out_file, dtype=str, keep_default_na=False)
+        saved.reindex(columns=out_cols).to_csv(out_file, index=False)
+    store_all.reindex(columns=out_cols).to_csv(out_file, mode='a', header=False, index=False)
+    return out_cols
+
+
+if __name__ == "__main__":
+    # Create Logs directory to capture all output messages
+    if not os.path.exists('Data/Logs'):
+        os.makedirs('Data/Logs')
+    print(os.getcwd())
+    print('Start Time = ', datetime.now())
+    start_time = time.perf_counter()    # Capture start time (monotonic clock for runtime)
+
+    #  Input command line parameter CSV file
+    #  Example batch input file record: TIC100990000,15.8999	6169,0.1656,ck04,n,54.819538,-42.7630276
+
+    input_para = pd.read_csv(in_file)  # Read batch input file
+    preload_sedmc()
+
+    ## Run SEDmc for each star in batch input file
+    # A new star is started as soon as one finishes, so slow VizieR queries don't hold up other stars.
+    # Each star runs in its own process, so a crashed star can't take others down and its memory is freed when it ends.
+    if os.path.exists(out_file):
+        os.remove(out_file)    # Start a new batch output file, so an old one is never mistaken for these results
+    out_cols = None    # Batch output file columns, set by the first star
+    stars = enumerate(input_para.itertuples(index=False, name=None))
+    running = {}    # Star number -> (process, star, start time)
+    finished = {}   # Star number -> star data, held until all earlier stars are written
+    next_out = 0    # Next star number to write, keeps the batch output file in input file order
+    more_stars = True
+    while more_stars or running:
+        while more_stars and len(running) < n_proc:
+            star = next(stars, None)
+            if star is None:
+                more_stars = False
+            else:
+                running[star[0]] = start_star(*star)
+        if not running:
+            break
+        wait([proc.sentinel for proc, star, job_start in running.values()])
+        for i in [i for i, (proc, star, job_start) in running.items() if not proc.is_alive()]:
+            finished[i] = finish_star(i, *running.pop(i))
+        while next_out in finished:
+            store_all = finished.pop(next_out)
+            if store_all is not None:
+                out_cols = append_star(store_all, out_cols)    # Add data for current star to batch output file
+            next_out += 1
+
+    # Show runtime for all stars in batch file input
+    runtime = timedelta(seconds=time.perf_counter() - start_time)
+    print('Runtime = ', runtime)
@@ -1,7 +1,6 @@
 # coding=utf-8
 # Imports
 import numpy as np
-import pandas as pd
 
 # Define global variable
 #global store_all, starmodel, min_model_temp, max_model_temp, Tau_Teff, \
@@ -21,6 +20,12 @@ import pandas as pd
 # Show sampler progress bar?
 prog_flag = False
 
+# Label observed data points with their index in Observed plots? (set False to speed up batch runs)
+annotate_points = True
+
+# Also save report figures as PNG files in Data/Figures? (the PDF report is built from in-memory images)
+save_figures = False
+
 # Set default sampling parameters
 nwalkers = 50
 niter = 5000
@@ -28,6 +33,8 @@ burn_in = 1000
 thin = 1
 f = 0.1
 log_f = np.log(f)
+exp_2_log_f = np.exp(2 * log_f)   # Flux variance fraction used in the likelihood
+FLUX_DTYPE = np.float32   # Model & observed flux dtype in the likelihood (chi-squared still summed in float64)
 
 model_lst = ['ck04','nextgen']
 starmodel = 'ck04'
@@ -43,19 +50,6 @@ wl_max = 8
 fit_err_init = 0.1
 fit_pts_min = 12
 
-## Create tables to store all input parameters and results
-## Fit Star using source name
-source_name = sname =""
-store_all = pd.DataFrame({'Source':sname}, index=[0])
-
-## Create tables to store all samplers data and results
-store_sampler_all = pd.DataFrame([])
-store_sampler = pd.DataFrame([])
-store_test = pd.DataFrame()
-check = 0
-
-# Capture all paralax data to chose one with lowest uncertainty
-plx_data = pd.DataFrame(columns = ['Plx', 'Plx_err', 'Plx_pre'])
 
 
 